@@ -0,0 +1,245 @@
+"""
+This file contains test cases to verify that the alternative board backends
+in the isolation package follow exactly the same rules as `isolation.Board`.
+"""
+import random
+import unittest
+
+import isolation
+
+
+def play_random_games(test, backend, num_games=20, w=7, h=7):
+    """Play random games on a reference `Board` and on `backend` side by side,
+    checking after every ply that both boards agree on the game state.
+    """
+    for _ in range(num_games):
+        reference = isolation.Board("p1", "p2", w, h)
+        board = backend("p1", "p2", w, h)
+        while True:
+            moves = sorted(reference.get_legal_moves())
+            test.assertEqual(moves, sorted(board.get_legal_moves()))
+            test.assertEqual(reference.get_blank_spaces(),
+                             board.get_blank_spaces())
+            test.assertEqual(reference.to_string(), board.to_string())
+            for player in ("p1", "p2"):
+                test.assertEqual(sorted(reference.get_legal_moves(player)),
+                                 sorted(board.get_legal_moves(player)))
+                test.assertEqual(reference.get_player_location(player),
+                                 board.get_player_location(player))
+                test.assertEqual(reference.utility(player),
+                                 board.utility(player))
+                test.assertEqual(reference.is_winner(player),
+                                 board.is_winner(player))
+                test.assertEqual(reference.is_loser(player),
+                                 board.is_loser(player))
+            if not moves:
+                break
+            move = random.choice(moves)
+            reference.apply_move(move)
+            board = board.forecast_move(move)
+
+
+class GeometryTest(unittest.TestCase):
+
+    def test_neighbor_tables(self):
+        """Neighbor tables list every on-board knight jump from each square"""
+        w, h = 6, 4
+        geometry = isolation.geometry.get_geometry(w, h)
+        self.assertIs(geometry, isolation.geometry.get_geometry(w, h))
+        for idx, (r, c) in enumerate(geometry.coords):
+            expected = sorted((r + dr) + (c + dc) * h
+                              for dr, dc in isolation.geometry.DIRECTIONS
+                              if 0 <= r + dr < h and 0 <= c + dc < w)
+            self.assertEqual(expected, sorted(geometry.neighbors[idx]))
+            self.assertEqual(sum(1 << n for n in expected),
+                             geometry.neighbor_masks[idx])
+
+
+class PushPopTest(unittest.TestCase):
+
+    def check_push_pop(self, backend):
+        board = backend("p1", "p2", 6, 5)
+        snapshots = []
+        while board.get_legal_moves():
+            snapshots.append((board.to_string(), board.move_count,
+                              board.active_player, board.hash()))
+            move = random.choice(board.get_legal_moves())
+            board.push(move)
+            self.assertEqual(board.get_player_location(board.inactive_player),
+                             move)
+        while snapshots:
+            board.pop()
+            self.assertEqual(snapshots.pop(),
+                             (board.to_string(), board.move_count,
+                              board.active_player, board.hash()))
+
+    def test_board_push_pop(self):
+        """Board.pop() restores the state from before each Board.push()"""
+        for _ in range(10):
+            self.check_push_pop(isolation.Board)
+
+    def test_bitboard_push_pop(self):
+        """BitBoard.pop() restores the state from before each BitBoard.push()"""
+        for _ in range(10):
+            self.check_push_pop(isolation.BitBoard)
+
+
+class MoveCacheTest(unittest.TestCase):
+
+    def check_cache(self, backend):
+        board = backend("p1", "p2", 5, 6)
+        depth = 0
+        while True:
+            for player in ("p1", "p2"):
+                moves = board.get_legal_moves(player, shuffle=False)
+                self.assertEqual(moves, board.get_legal_moves(player, shuffle=False))
+                moves.append((-1, -1))
+                self.assertEqual(list(board._generate_moves(
+                    board._player_index(player))),
+                    board.get_legal_moves(player, shuffle=False))
+            moves = board.get_legal_moves()
+            if not moves or random.random() < 0.2 and depth:
+                break
+            board.push(random.choice(moves))
+            depth += 1
+        while depth:
+            board.pop()
+            depth -= 1
+            self.assertEqual(sorted(board.get_legal_moves()),
+                             sorted(board.copy()._generate_moves(
+                                 board._player_index(board.active_player))))
+
+    def test_cached_moves_follow_push_pop(self):
+        """Memoized legal moves are invalidated by push() and pop() and are
+        not affected by changes to the returned lists"""
+        for backend in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                self.check_cache(backend)
+
+
+class ZobristTest(unittest.TestCase):
+
+    def fresh_hash(self, board):
+        """Recompute the Zobrist hash of a board from scratch"""
+        board._zobrist = None
+        return board.zobrist
+
+    def test_incremental_hash(self):
+        """Incremental Zobrist updates match a full recomputation"""
+        for _ in range(10):
+            board = isolation.Board("p1", "p2", 5, 6)
+            bitboard = isolation.BitBoard("p1", "p2", 5, 6)
+            hashes = [board.zobrist]
+            while board.get_legal_moves():
+                move = random.choice(board.get_legal_moves())
+                board.push(move)
+                bitboard = bitboard.forecast_move(move)
+                self.assertEqual(board.zobrist, bitboard.zobrist)
+                self.assertEqual(board.zobrist, self.fresh_hash(board.copy()))
+                self.assertNotIn(board.zobrist, hashes)
+                hashes.append(board.zobrist)
+            while hashes:
+                self.assertEqual(hashes.pop(), board.zobrist)
+                if hashes:
+                    board.pop()
+
+
+class PartitionTest(unittest.TestCase):
+
+    def bfs_region(self, board, start):
+        """Return the set of open squares reachable by knight moves"""
+        region, frontier = set(), [start]
+        while frontier:
+            r, c = frontier.pop()
+            for dr, dc in isolation.geometry.DIRECTIONS:
+                square = (r + dr, c + dc)
+                if square not in region and board.move_is_legal(square):
+                    region.add(square)
+                    frontier.append(square)
+        return region
+
+    def test_reachable_regions(self):
+        """reachable() and is_partitioned() agree with a search over
+        coordinates"""
+        for backend in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                board = backend("p1", "p2", 6, 5)
+                self.assertFalse(board.is_partitioned())
+                board.apply_move(random.choice(board.get_legal_moves()))
+                while board.get_legal_moves():
+                    board.apply_move(random.choice(board.get_legal_moves()))
+                    regions = []
+                    for player in ("p1", "p2"):
+                        region = self.bfs_region(
+                            board, board.get_player_location(player))
+                        mask = sum(1 << (r + c * board.height)
+                                   for r, c in region)
+                        self.assertEqual(mask, board.reachable(player))
+                        regions.append(region)
+                    self.assertEqual(not regions[0] & regions[1],
+                                     board.is_partitioned())
+
+
+class SymmetryTest(unittest.TestCase):
+
+    def test_canonical_key(self):
+        """Symmetric positions share a canonical key, and the returned
+        transform maps a position onto its canonical image"""
+        for backend, (w, h) in [(isolation.Board, (7, 7)),
+                                (isolation.BitBoard, (5, 5)),
+                                (isolation.BitBoard, (6, 4))]:
+            num_symmetries = 8 if w == h else 4
+            board = backend("p1", "p2", w, h)
+            self.assertEqual(num_symmetries,
+                             len(board._geometry.symmetries))
+            history = []
+            for _ in range(6):
+                moves = board.get_legal_moves()
+                if not moves:
+                    break
+                history.append(random.choice(moves))
+                board.apply_move(history[-1])
+            key, transform = board.canonical()
+            for t in range(num_symmetries):
+                image = backend("p1", "p2", w, h)
+                for move in history:
+                    image.apply_move(board.transform_move(move, t))
+                self.assertEqual(key, image.canonical()[0])
+                self.assertEqual(move, image.transform_move(
+                    board.transform_move(move, t), t, inverse=True))
+            image = backend("p1", "p2", w, h)
+            for move in history:
+                image.apply_move(board.transform_move(move, transform))
+            self.assertEqual(key, image.zobrist)
+
+
+class BitBoardTest(unittest.TestCase):
+
+    def test_matches_reference_board(self):
+        """BitBoard agrees with Board on square and rectangular boards"""
+        for w, h in [(7, 7), (5, 5), (8, 5), (4, 9)]:
+            play_random_games(self, isolation.BitBoard, w=w, h=h)
+
+    def test_move_is_legal(self):
+        """BitBoard rejects moves off the board or onto blocked squares"""
+        board = isolation.BitBoard("p1", "p2", 5, 4)
+        board.apply_move((2, 3))
+        self.assertFalse(board.move_is_legal((2, 3)))
+        self.assertFalse(board.move_is_legal((4, 0)))
+        self.assertFalse(board.move_is_legal((0, 5)))
+        self.assertFalse(board.move_is_legal((-1, 0)))
+        self.assertTrue(board.move_is_legal((3, 4)))
+
+    def test_copy_is_independent(self):
+        """Applying a move to a copy leaves the original board unchanged"""
+        board = isolation.BitBoard("p1", "p2")
+        board.apply_move((3, 3))
+        before = board.to_string()
+        child = board.forecast_move((0, 0))
+        self.assertEqual(before, board.to_string())
+        self.assertEqual(child.get_player_location("p2"), (0, 0))
+        self.assertIsNone(board.get_player_location("p2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
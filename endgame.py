@@ -0,0 +1,102 @@
+"""This file contains an exact solver for partitioned Isolation endgames.
+
+Once the two players can no longer reach a common square (see
+`isolation.Board.is_partitioned`), neither player's moves affect the other,
+so each player should simply make the longest possible sequence of knight
+moves through its own region. The player to move wins exactly when its
+longest path is longer than the opponent's.
+"""
+from isolation.geometry import get_geometry
+
+
+def longest_path(neighbor_masks, idx, open_bits, memo, check_time=None):
+    """Return the number of moves in the longest knight path starting at a
+    square and visiting only open squares, each at most once.
+
+    Parameters
+    ----------
+    neighbor_masks : list<int>
+        The knight-move mask of each square (`Geometry.neighbor_masks`).
+
+    idx : int
+        The square index the path starts from.
+
+    open_bits : int
+        The mask of squares the path may visit.
+
+    memo : dict
+        Path lengths already computed, keyed by (square, open mask); the
+        same dict can be reused for any position on boards of one size.
+
+    check_time : callable (optional)
+        A function called once per solved subproblem that may raise an
+        exception to abort the search (e.g., `CustomPlayer.check_time`).
+
+    Returns
+    ----------
+    int
+        The length of the longest path
+    """
+    key = (idx, open_bits)
+    length = memo.get(key)
+    if length is not None:
+        return length
+    if check_time is not None:
+        check_time()
+    # no path can be longer than the number of open squares left
+    limit = bin(open_bits).count("1")
+    length = 0
+    moves = neighbor_masks[idx] & open_bits
+    while moves and length < limit:
+        low = moves & -moves
+        moves ^= low
+        length = max(length, 1 + longest_path(
+            neighbor_masks, low.bit_length() - 1, open_bits ^ low, memo,
+            check_time))
+    memo[key] = length
+    return length
+
+
+def solve_partitioned(game, player, memo, check_time=None, results=None):
+    """Return the length of the longest path for a player and the first move
+    of that path.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The current game state; the player must have moved already.
+
+    player : object
+        An object registered as a player in the current game.
+
+    memo : dict
+        The memo passed on to `longest_path()`.
+
+    check_time : callable (optional)
+        The abort callback passed on to `longest_path()`.
+
+    results : list (optional)
+        A (length, move) pair is appended for each move as soon as its path
+        length is known, so that the results survive an aborted search.
+
+    Returns
+    ----------
+    int
+        The number of moves the player can still make
+
+    tuple(int, int)
+        The first move of the longest path; (-1, -1) for no legal moves
+    """
+    if results is None:
+        results = []
+    geometry = get_geometry(game.width, game.height)
+    open_bits = game.reachable(player)
+    best_length, best_move = 0, (-1, -1)
+    for move in game.get_legal_moves(player, shuffle=False):
+        idx = move[0] + move[1] * game.height
+        length = 1 + longest_path(geometry.neighbor_masks, idx,
+                                  open_bits & ~(1 << idx), memo, check_time)
+        results.append((length, move))
+        if length > best_length:
+            best_length, best_move = length, move
+    return best_length, best_move
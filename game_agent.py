@@ -6,14 +6,148 @@ augment the test suite with your own test cases to further test your code.
 You must test your agent's strength against a set of agents with known
 relative strength using tournament.py and include the results in your report.
 """
-import random
+import math
+import multiprocessing
 import sys
+import time
+
+from operator import itemgetter
+
+from endgame import solve_partitioned
+from search_stats import SearchStats
+from transposition import EXACT, LOWER, UPPER
+from transposition import PERSPECTIVE_KEY
+from transposition import EvalCache
+from transposition import SharedTranspositionTable
+from transposition import TranspositionTable
 
 class Timeout(Exception):
     """Subclass base exception for code clarity."""
     pass
 
 
+# Pondering stops on its own after this many milliseconds if get_move() is
+# not called again (e.g., because the game is over)
+PONDER_LIMIT = 60000.
+
+# The search agent of a parallel search or pondering worker process; it is
+# kept alive between tasks so that its caches carry over from move to move
+_worker_player = None
+
+# The shared deadline of the pondering worker process, in
+# `time.monotonic()` milliseconds
+_ponder_deadline = None
+
+
+def _init_worker(settings):
+    """Create the search agent of a worker process (see
+    `CustomPlayer.parallel_search`).
+    """
+    global _worker_player
+    _worker_player = CustomPlayer(**settings)
+
+
+def _init_ponder_worker(settings, deadline):
+    """Create the search agent of the pondering worker process (see
+    `CustomPlayer.start_pondering`).
+    """
+    global _ponder_deadline
+    _init_worker(settings)
+    _ponder_deadline = deadline
+
+
+def _worker_game(agent, backend, width, height, seat, moves):
+    """Recreate a position in a worker process from the moves returned by
+    `replay_moves()`, with `agent` in the seat of the searching player.
+    """
+    players = [agent, "opponent"] if seat == 0 else ["opponent", agent]
+    game = backend(players[0], players[1], width, height)
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def _ponder(task):
+    """Search a position in the pondering worker process until the shared
+    deadline, and return the move chosen by get_move().
+
+    Parameters
+    ----------
+    task : tuple
+        The board class, width and height, the index of the searching player
+        (0 for player 1, 1 for player 2) and the moves returned by
+        `replay_moves()` for the position.
+    """
+    agent = _worker_player
+    game = _worker_game(agent, *task)
+    time_left = lambda: _ponder_deadline.value - 1000 * time.monotonic()
+    return agent.get_move(game, game.get_legal_moves(), time_left)
+
+
+def _search_root_move(task):
+    """Search one root move in a worker process.
+
+    Parameters
+    ----------
+    task : tuple
+        The board class, width and height, the index of the searching player
+        (0 for player 1, 1 for player 2), the moves returned by
+        `replay_moves()` for the position, the root move, the search depth,
+        the lower bound of the search window (alphabeta only) and the turn
+        deadline in `time.monotonic()` milliseconds.
+
+    Returns
+    ----------
+    (float, (int, int)) or None
+        The score and the root move, or None if the deadline passed first
+    """
+    backend, width, height, seat, moves, move, depth, alpha, deadline = task
+    agent = _worker_player
+    game = _worker_game(agent, backend, width, height, seat, moves)
+    time_left = lambda: deadline - 1000 * time.monotonic()
+    if game.move_count != agent.last_move_count:
+        agent.start_search(game, time_left)
+    else:
+        agent.time_left = time_left
+        agent.nodes_until_check = 0
+        agent.last_check = None
+    if agent.method == 'minimax':
+        args = (agent.minimax, depth - 1, False)
+    else:
+        args = (agent.alphabeta, depth - 1, alpha, float("inf"), False)
+    try:
+        score = agent.search_child(game, move, *args)
+    except Timeout:
+        return None
+    return score, move
+
+
+def replay_moves(game):
+    """Return a sequence of moves that recreates the blocked squares, the
+    player locations and the side to move of `game` when it is applied to
+    an empty board. apply_move() does not check that moves are legal, so
+    the order in which the other blocked squares were visited can be lost.
+    """
+    locations = [game.get_player_location(player)
+                 for player in (game.active_player, game.inactive_player)]
+    if game.move_count % 2:
+        locations.reverse()
+    blanks = set(game.get_blank_spaces())
+    blocked = [(r, c) for c in range(game.width) for r in range(game.height)
+               if (r, c) not in blanks and (r, c) not in locations]
+    player_moves = ([], [])
+    for count in range(game.move_count):
+        player_moves[count % 2].append(None)
+    for moves, location in zip(player_moves, locations):
+        if moves:
+            moves[-1] = location
+    for moves in player_moves:
+        for idx in range(len(moves) - 1):
+            moves[idx] = blocked.pop()
+    return [player_moves[count % 2][count // 2]
+            for count in range(game.move_count)]
+
+
 def custom_score_3(game, player):
     """
     Results: 42.86%
@@ -95,23 +229,187 @@ class CustomPlayer:
         iterative deepening search (True).  When True, search_depth should
         be ignored and no limit to search depth.
 
-    method : {'minimax', 'alphabeta'} (optional)
-        The name of the search method to use in get_move().
+    method : {'minimax', 'alphabeta', 'aspiration', 'pvs'} (optional)
+        The name of the search method to use in get_move(). 'aspiration' is
+        alpha-beta search where each iterative deepening iteration starts
+        with a narrow window around the previous iteration's score (and is
+        re-searched with a wider window if the score falls outside it), and
+        'pvs' is principal variation search, which searches every move after
+        the first at each node with a null window.
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    inplace : boolean (optional)
+        Flag indicating whether the search should make and unmake moves on a
+        single board with `Board.push()` / `Board.pop()` (True) or search a
+        new copy of the board from `Board.forecast_move()` for every child
+        (False).
+
+    tt_size : int (optional)
+        The number of entries in the transposition table used by alpha-beta
+        search, which fixes its memory footprint; 0 disables the table.
+
+    tt_policy : {'depth', 'always'} (optional)
+        The replacement policy of the transposition table (see
+        `transposition.TranspositionTable`).
+
+    tt : object (optional)
+        A transposition table to use instead of creating one from tt_size
+        and tt_policy, e.g., a `transposition.SharedTranspositionTable`
+        shared with other processes. The worker processes of a parallel
+        search (see `workers`) all share a shared table.
+
+    aspiration_window : float (optional)
+        Half the width of the initial root window when method='aspiration'.
+
+    ordering : boolean (optional)
+        Flag indicating whether alpha-beta search should order the moves at
+        each node (transposition table move first, then killer moves for the
+        ply, then the remaining moves by history score) instead of searching
+        them in random order.
+
+    check_interval : int (optional)
+        The maximum number of nodes searched between reads of the clock.
+        The actual interval adapts to the measured search speed so that the
+        clock is read more often as the TIMER_THRESHOLD margin approaches;
+        1 reads the clock at every node.
+
+    eval_cache_size : int (optional)
+        The number of heuristic scores to cache by position (see
+        `transposition.EvalCache`); 0 disables the cache. The cache hit
+        counters are reset at the start of every game.
+
+    symmetry_plies : int (optional)
+        At positions with fewer than this many moves played, only one of the
+        moves leading to symmetric positions (see `Board.canonical()`) is
+        searched, which shrinks the opening search by up to 8x on square
+        boards; 0 searches every move. Scores are unchanged as long as
+        score_fn gives symmetric positions the same score.
+
+    endgame : boolean (optional)
+        Flag indicating whether get_move() should switch to the exact
+        longest-path solver in `endgame.py` once the players are in separate
+        regions of the board (see `Board.is_partitioned()`). Solved paths
+        are remembered until the end of the game.
+
+    tablebase : `tablebase.Tablebase` (optional)
+        An endgame tablebase; get_move() plays the tablebase move without
+        searching in every state the table covers.
+
+    opening_book : `opening_book.OpeningBook` (optional)
+        An opening book; get_move() plays the book move without searching
+        in every state the book covers.
+
+    workers : int (optional)
+        The number of worker processes for iterative deepening search; with
+        more than one, the root moves of each iteration are searched in
+        parallel (see `parallel_search()`). The processes are started with
+        the agent (see `start()`) and kept until `close()`; 0 searches in
+        the calling process.
+
+    ponder : boolean (optional)
+        Flag indicating whether to keep searching in a background worker
+        process after each move, on the position reached by the opponent
+        reply that the agent expects (see `start_pondering()`). If the
+        opponent plays that reply, the next get_move() call lets the worker
+        finish within the turn and plays its move (a ponder hit); otherwise
+        the worker is stopped and the position is searched as usual. The
+        worker process is started with the agent (see `start()`).
+
+    reuse_search : boolean (optional)
+        Flag indicating whether iterative deepening should pick up where the
+        previous get_move() call of the same game left off: it starts two
+        plies below the deepest iteration completed by that call, and first
+        searches the move that the principal variation of that call
+        predicted for this position. The transposition table and history
+        scores carry over between calls either way.
+
+    stats_log : str (optional)
+        The path of a file that get_move() appends the search statistics of
+        every move to, one JSON object per line (see
+        `search_stats.SearchStats`). The statistics of the last move are
+        also available from the `stats` attribute either way; searches in
+        worker processes are not counted.
     """
 
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10.):
+                 iterative=True, method='minimax', timeout=10.,
+                 inplace=False, tt_size=0, tt_policy='depth',
+                 aspiration_window=2., ordering=False, check_interval=1,
+                 eval_cache_size=0, symmetry_plies=0, endgame=False,
+                 tablebase=None, opening_book=None, workers=0, tt=None,
+                 ponder=False, reuse_search=False, stats_log=None):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
+        if eval_cache_size:
+            self.score = EvalCache(score_fn, eval_cache_size)
         self.method = method
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.check_interval = check_interval
+        self.nodes_until_check = 0
+        self.last_check = None
+        self.inplace = inplace
+        self.tt = tt
+        if tt is None and tt_size:
+            self.tt = TranspositionTable(tt_size, tt_policy)
+        self.aspiration_window = aspiration_window
+        self.ordering = ordering
+        self.killers = {}  # move_count -> the last two cutoff moves at that ply
+        self.history = ({}, {})  # [maximizing_player][move] -> cutoff score
+        self.last_move_count = -1
+        self.symmetry_plies = symmetry_plies
+        self.endgame = endgame
+        self.endgame_memo = {}  # (square, open mask) -> longest path length
+        self.tablebase = tablebase
+        self.opening_book = opening_book
+        self.workers = workers
+        self.pool = None
+        self.ponder = ponder
+        self.ponder_pool = None
+        self.ponder_deadline = None
+        self.ponder_job = None
+        self.ponder_key = None  # Zobrist hash of the pondered position
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self.reuse_search = reuse_search
+        self.last_depth = 0  # the deepest iteration completed by get_move()
+        self.pv = []  # the principal variation of that iteration
+        self.pv_key = None  # Zobrist hash of the position after pv[:2]
+        self.stats = SearchStats()
+        self.stats_log = stats_log
+        self.start()
+
+    def __getstate__(self):
+        # the turn clock and worker processes belong to the process that
+        # created them, e.g., when agents are sent to tournament workers
+        state = self.__dict__.copy()
+        state.update(time_left=None, pool=None, ponder_pool=None,
+                     ponder_deadline=None, ponder_job=None)
+        return state
+
+    def start(self):
+        """Start the worker processes of the parallel search and of
+        pondering, if the agent uses them and they are not running yet.
+
+        The constructor calls this, so that starting processes does not use
+        up the clock of the first move; get_move() calls it again at the
+        start of a turn for agents that were copied to another process,
+        which does not copy the worker processes.
+        """
+        if self.workers > 1 and self.pool is None:
+            self.pool = multiprocessing.Pool(
+                self.workers, _init_worker, (self.worker_settings(),))
+        if self.ponder and self.ponder_pool is None:
+            self.ponder_deadline = multiprocessing.RawValue("d", 0.)
+            settings = self.worker_settings()
+            settings.update(iterative=True)
+            self.ponder_pool = multiprocessing.Pool(
+                1, _init_ponder_worker, (settings, self.ponder_deadline))
 
     def get_move(self, game, legal_moves, time_left):
         """Search for the best move from the available legal moves and return a
@@ -148,8 +446,32 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.start()
+        if not self.ponder:
+            move = self.search_move(game, legal_moves, time_left)
+        else:
+            move = self.ponder_result(game, legal_moves, time_left)
+            if move is None:
+                move = self.search_move(game, legal_moves, time_left)
+            else:
+                # the move was searched by the pondering worker
+                self.stats.reset()
+        self.stats.finish()
+        if self.stats_log is not None:
+            with open(self.stats_log, "a") as log:
+                log.write(self.stats.to_json() + "\n")
+        if self.ponder:
+            self.start_pondering(game, move, time_left)
+        return move
+
+    def search_move(self, game, legal_moves, time_left):
+        """Choose the move returned by get_move() from the opening book, the
+        endgame tablebase or solver, or by searching the game tree.
+
+        See `get_move` for the parameters and return value.
+        """
 
-        self.time_left = time_left
+        self.start_search(game, time_left)
 
         # TODO: finish this function!
         best_score = float('-inf')
@@ -160,44 +482,432 @@ class CustomPlayer:
         if not legal_moves:
             return (-1,-1)
         best_move = legal_moves[0]
-        
-        if game.move_count < 1:   # opening book
-            opening_book = [(2, 2), (game.width-3, 2), (4, 2), (2, game.width-3), (game.width-3, game.width-3), (game.width-2, game.width-3), (2, game.width-2), (game.width-3, game.width-2), (game.width-2, game.width-2)]
-            
-            return opening_book[random.randint(0, len(opening_book)-1)]
+        root_results = []
+        alpha = float("-inf")
+
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(game)
+            if move is not None:
+                return move
+
+        if self.tablebase is not None and self.tablebase.covers(game):
+            move = self.tablebase.best_move(game)
+            if move is not None:
+                return move
 
         try:
             # The search method call (alpha beta or minimax) should happen in
             # here in order to avoid timeout. The try/except block will
             # automatically catch the exception raised by the search method
             # when the timer gets close to expiring
-            if self.iterative:
-                for i in range (1, sys.maxsize):
-                    if self.method == 'alphabeta':
-                        if self.time_left() < self.TIMER_THRESHOLD:
-                            raise Timeout()
-                        score, move = self.alphabeta(game, i)
-                        if score > best_score:
-                            best_score = score
-                            best_move = move
-                    else:
-                        if self.time_left() < self.TIMER_THRESHOLD:
-                            raise Timeout()
-                        score, move = self.minimax(game, i)
-                        if score > best_score:
-                            best_score = score
-                            best_move = move            
+            if self.endgame and game.is_partitioned():
+                # neither player can interfere with the other any more, so
+                # the best move starts the longest path through our region
+                _, best_move = solve_partitioned(
+                    game, self, self.endgame_memo, self.check_time,
+                    root_results)
+            elif self.iterative and self.workers > 1:
+                best_move = self.parallel_search(game, legal_moves)
+            elif self.iterative:
+                # Search the previous iteration's best move first, and keep
+                # the score of every root move as soon as its subtree is
+                # complete so an interrupted iteration is not wasted
+                root_moves = list(legal_moves)
+                if game.move_count < self.symmetry_plies:
+                    root_moves = self.unique_moves(game, root_moves)
+                start_depth = 1
+                if self.reuse_search:
+                    start_depth = max(1, self.last_depth - 2)
+                    if game.zobrist == self.pv_key and self.pv[2] in root_moves:
+                        root_moves.remove(self.pv[2])
+                        root_moves.insert(0, self.pv[2])
+                self.last_depth = 0
+                for i in range (start_depth, sys.maxsize):
+                    self.check_time()
+                    alpha, beta = float("-inf"), float("inf")
+                    if (self.method == 'aspiration' and i > 1 and
+                            abs(best_score) != float("inf")):
+                        alpha = best_score - self.aspiration_window
+                        beta = best_score + self.aspiration_window
+                    while True:
+                        root_results = []
+                        score, move = self.search_root(
+                            game, i, root_moves, root_results, alpha, beta)
+                        # re-search with the failed side of the aspiration
+                        # window opened up; a failed search only bounds the
+                        # scores, so best_move keeps the last completed result
+                        if score <= alpha and alpha > float("-inf"):
+                            alpha = float("-inf")
+                        elif score >= beta and beta < float("inf"):
+                            beta = float("inf")
+                        else:
+                            break
+                    best_score, best_move = score, move
+                    root_moves.remove(best_move)
+                    root_moves.insert(0, best_move)
+                    self.last_depth = i
+                    self.stats.end_iteration(i)
+                    if self.reuse_search:
+                        self.store_pv(game, best_move, i)
             else:
                 if self.method == 'minimax':
                     best_score, best_move = self.minimax(game, self.search_depth)
                 else:
                     best_score, best_move = self.alphabeta(game, self.search_depth)
+                self.stats.end_iteration(self.search_depth)
                      
         except Timeout:
+            if root_results:
+                # a move that failed low is not known to beat the best move
+                # of the last completed iteration
+                score, move = max(root_results, key=itemgetter(0))
+                if score > alpha:
+                    best_score, best_move = score, move
             return best_move
 
         return best_move
 
+    def start_search(self, game, time_left):
+        """Reset the per-search state of the agent before searching `game`
+        within the turn clock `time_left`.
+        """
+        self.time_left = time_left
+        self.nodes_until_check = 0
+        self.last_check = None
+        self.stats.reset()
+        # the move count only decreases between calls when a new game starts
+        if game.move_count <= self.last_move_count:
+            self.new_game()
+        self.last_move_count = game.move_count
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.ordering:
+            self.killers.clear()
+            for history in self.history:
+                for move in history:
+                    history[move] //= 2
+
+    def new_game(self):
+        """Reset the per-game state of the agent; get_move() calls this
+        automatically when it is first called for a new game.
+        """
+        if isinstance(self.score, EvalCache):
+            self.score.reset_stats()
+        self.endgame_memo.clear()
+        self.last_depth = 0
+        self.pv = []
+        self.pv_key = None
+
+    def store_pv(self, game, move, depth):
+        """Record the principal variation of a completed iteration: the best
+        root move followed by the best moves stored in the transposition
+        table, if any.
+        """
+        self.pv = [move]
+        board = game.forecast_move(move)
+        maximizing_player = False
+        while self.tt is not None and len(self.pv) < depth:
+            key = board.zobrist if maximizing_player else board.zobrist ^ PERSPECTIVE_KEY
+            entry = self.tt.probe(key)
+            if entry is None or entry.move not in board.get_legal_moves():
+                break
+            self.pv.append(entry.move)
+            board.apply_move(entry.move)
+            maximizing_player = not maximizing_player
+        self.pv_key = None
+        if len(self.pv) > 2:
+            self.pv_key = game.forecast_move(move).forecast_move(self.pv[1]).zobrist
+
+    def check_time(self):
+        """Raise Timeout if less than TIMER_THRESHOLD milliseconds are left
+        in the turn. The clock is only read every `nodes_until_check` calls;
+        after each read the interval is set from the measured number of
+        calls per millisecond so that the next read happens after about half
+        of the remaining time above the threshold has been used.
+        """
+        self.nodes_until_check -= 1
+        if self.nodes_until_check > 0:
+            return
+        remaining = self.time_left() - self.TIMER_THRESHOLD
+        if remaining <= 0:
+            raise Timeout()
+        interval = 1
+        if self.check_interval > 1:
+            if self.last_check is not None:
+                last_remaining, last_interval = self.last_check
+                elapsed = last_remaining - remaining
+                if elapsed > 0:
+                    interval = int(last_interval * remaining / (2 * elapsed))
+                else:
+                    interval = 2 * last_interval
+            interval = max(1, min(interval, self.check_interval))
+            self.last_check = (remaining, interval)
+        self.nodes_until_check = interval
+
+    def parallel_search(self, game, legal_moves):
+        """Run iterative deepening with the root moves of each iteration
+        split across the worker processes.
+
+        The first root move is searched on its own with a full window, and
+        the other root moves are then searched in parallel with its score
+        as the lower bound of the window, so that they only have to prove
+        they are no better (as in search_root()). Each move is searched by
+        the persistent agent of one worker, which aborts on its own at the
+        TIMER_THRESHOLD margin. Results are collected in root move order, so
+        an interrupted iteration is used only up to the first unfinished
+        move, as in search_root().
+
+        Returns
+        ----------
+        (int, int)
+            The best move found
+        """
+        deadline = 1000 * time.monotonic() + self.time_left()
+        task = (type(game), game.width, game.height, game.move_count % 2,
+                replay_moves(game))
+        root_moves = list(legal_moves)
+        if game.move_count < self.symmetry_plies:
+            root_moves = self.unique_moves(game, root_moves)
+        best_move = root_moves[0]
+        for depth in range(1, sys.maxsize):
+            job = self.pool.apply_async(
+                _search_root_move,
+                (task + (root_moves[0], depth, float("-inf"), deadline),))
+            results = self.collect_results([job], deadline)
+            if results:
+                alpha = results[0][0]
+                jobs = [self.pool.apply_async(
+                            _search_root_move,
+                            (task + (move, depth, alpha, deadline),))
+                        for move in root_moves[1:]]
+                results += self.collect_results(jobs, deadline)
+                # max() keeps the first root move when a later move fails
+                # low and returns the bound itself
+                _, best_move = max(results, key=itemgetter(0))
+            if len(results) < len(root_moves):
+                return best_move
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+
+    def collect_results(self, jobs, deadline):
+        """Return the (score, move) results of the `_search_root_move()`
+        jobs in order, up to the first job that is not finished by the
+        TIMER_THRESHOLD margin before `deadline` (in `time.monotonic()`
+        milliseconds) or that ran out of time in its worker.
+        """
+        results = []
+        for job in jobs:
+            remaining = (deadline - self.TIMER_THRESHOLD -
+                         1000 * time.monotonic())
+            if remaining <= 0:
+                break
+            try:
+                result = job.get(remaining / 1000.)
+            except multiprocessing.TimeoutError:
+                break
+            if result is None:
+                break
+            results.append(result)
+        return results
+
+    def predict_reply(self, game, move, time_left=None):
+        """Return the opponent reply expected after `move`: the best move
+        stored in the transposition table for that position, or else the
+        reply that leaves the position with the lowest heuristic score. None
+        if the opponent will have no legal moves.
+
+        With a turn clock `time_left`, scoring the replies stops once half
+        of the TIMER_THRESHOLD margin is left, and the best reply scored so
+        far is returned.
+        """
+        child = game.forecast_move(move)
+        replies = child.get_legal_moves(shuffle=False)
+        if not replies:
+            return None
+        if self.tt is not None:
+            entry = self.tt.probe(child.zobrist ^ PERSPECTIVE_KEY)
+            if entry is not None and entry.move in replies:
+                return entry.move
+        best_score, best_reply = float("inf"), replies[0]
+        for reply in replies:
+            if (time_left is not None and
+                    time_left() < self.TIMER_THRESHOLD / 2):
+                break
+            score = self.score(child.forecast_move(reply), self)
+            if score < best_score:
+                best_score, best_reply = score, reply
+        return best_reply
+
+    def start_pondering(self, game, move, time_left=None):
+        """Start searching the position reached by `move` and the predicted
+        opponent reply in the pondering worker process (see `start()`).
+
+        The search of get_move() stops at the TIMER_THRESHOLD margin, and
+        pondering is set up in the first half of that margin: with a turn
+        clock `time_left`, nothing is started once less is left.
+        """
+        if time_left is None:
+            time_left = lambda: float("inf")
+        if move not in game.get_legal_moves():
+            return
+        reply = self.predict_reply(game, move, time_left)
+        if reply is None:
+            return
+        position = game.forecast_move(move).forecast_move(reply)
+        if not position.get_legal_moves():
+            return
+        if self.ponder_pool is None or time_left() < self.TIMER_THRESHOLD / 2:
+            return
+        self.ponder_deadline.value = 1000 * time.monotonic() + PONDER_LIMIT
+        self.ponder_key = position.zobrist
+        task = (type(game), game.width, game.height, game.move_count % 2,
+                replay_moves(position))
+        self.ponder_job = self.ponder_pool.apply_async(_ponder, (task,))
+
+    def ponder_result(self, game, legal_moves, time_left):
+        """Return the move found by pondering if `game` is the pondered
+        position, or None after stopping the pondering search if it is not.
+
+        On a ponder hit the worker stops half a TIMER_THRESHOLD earlier
+        than a search in this process would, leaving time to hand over its
+        move.
+        """
+        job, self.ponder_job = self.ponder_job, None
+        if job is None:
+            return None
+        if game.zobrist != self.ponder_key:
+            self.ponder_misses += 1
+            self.ponder_deadline.value = 0.
+            return None
+        self.ponder_hits += 1
+        self.ponder_deadline.value = (1000 * time.monotonic() + time_left() -
+                                      self.TIMER_THRESHOLD / 2)
+        try:
+            move = job.get(max(0., time_left() - self.TIMER_THRESHOLD) / 1000.)
+        except multiprocessing.TimeoutError:
+            return None
+        return move if move in legal_moves else None
+
+    def worker_settings(self):
+        """Return the constructor arguments of the search agents of the
+        worker processes.
+        """
+        score_fn, eval_cache_size = self.score, 0
+        if isinstance(self.score, EvalCache):
+            score_fn, eval_cache_size = self.score.score_fn, self.score.size
+        settings = dict(score_fn=score_fn, iterative=False,
+                        method=self.method, timeout=self.TIMER_THRESHOLD,
+                        inplace=self.inplace, ordering=self.ordering,
+                        check_interval=self.check_interval,
+                        eval_cache_size=eval_cache_size,
+                        symmetry_plies=self.symmetry_plies)
+        if isinstance(self.tt, SharedTranspositionTable):
+            settings.update(tt=self.tt)
+        elif self.tt is not None:
+            settings.update(tt_size=self.tt.size, tt_policy=self.tt.policy)
+        return settings
+
+    def close(self):
+        """Stop the worker processes of the parallel search and of
+        pondering, if any.
+        """
+        self.ponder_job = None
+        for name in ("pool", "ponder_pool"):
+            pool = getattr(self, name)
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+                setattr(self, name, None)
+
+    def search_root(self, game, depth, root_moves, root_results,
+                    alpha=float("-inf"), beta=float("inf")):
+        """Search each root move in turn to the given depth with the search
+        method selected by self.method.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state
+
+        depth : int
+            The maximum number of plies to search, counting the root move
+
+        root_moves : list<(int, int)>
+            The legal moves of the active player, in the order to search them
+
+        root_results : list
+            A (score, move) pair is appended for each root move as soon as
+            its search completes, so that the results survive a Timeout
+            raised part way through the iteration
+
+        alpha : float
+            The lower bound of the root search window
+
+        beta : float
+            The upper bound of the root search window
+
+        Returns
+        ----------
+        float
+            The score of the best root move
+
+        tuple(int, int)
+            The best root move; the earliest searched move wins ties
+        """
+        for idx, move in enumerate(root_moves):
+            self.check_time()
+            if self.method == 'minimax':
+                score = self.search_child(game, move, self.minimax, depth - 1, False)
+            elif self.method == 'pvs' and idx > 0:
+                score = self.scout_child(game, move, depth - 1, alpha, beta, True)
+            else:
+                score = self.search_child(game, move, self.alphabeta,
+                                          depth - 1, alpha, beta, False)
+            root_results.append((score, move))
+            if score >= beta:
+                break
+            alpha = max(alpha, score)
+        return max(root_results, key=itemgetter(0))
+
+    def search_child(self, game, move, search, *args):
+        """Return the score from calling `search(child, *args)` on the game
+        state reached by applying `move`, where `search` is one of the
+        search methods of this class.
+        """
+        if self.inplace:
+            game.push(move)
+            try:
+                score, _ = search(game, *args)
+            finally:
+                game.pop()
+        else:
+            score, _ = search(game.forecast_move(move), *args)
+        return score
+
+    def scout_child(self, game, move, depth, alpha, beta, maximizing_player):
+        """Search a move that is not expected to be on the principal variation
+        with a null window, and re-search it with the full (alpha, beta)
+        window only if the null-window result shows that it might be.
+
+        Parameters
+        ----------
+        maximizing_player : bool
+            Flag indicating whether `game` (the parent of the searched
+            position) is a maximizing layer (True) or a minimizing layer
+            (False)
+        """
+        if maximizing_player:
+            window = (alpha, math.nextafter(alpha, float("inf")))
+        else:
+            window = (math.nextafter(beta, float("-inf")), beta)
+        score = self.search_child(game, move, self.alphabeta, depth,
+                                  window[0], window[1], not maximizing_player)
+        if alpha < score < beta:
+            score = self.search_child(game, move, self.alphabeta, depth,
+                                      alpha, beta, not maximizing_player)
+        return score
+
     def minimax(self, game, depth, maximizing_player=True):
         """Implement the minimax search algorithm as described in the lectures.
 
@@ -223,10 +933,12 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
+        self.check_time()
+        self.stats.nodes += 1
             
         legal_moves = game.get_legal_moves(game.active_player)
+        if game.move_count < self.symmetry_plies:
+            legal_moves = self.unique_moves(game, legal_moves)
         best_score = float('-inf')
         best_move = (-1, -1)
         
@@ -234,17 +946,18 @@ class CustomPlayer:
             best_score = float('inf')
             
         if not legal_moves:
+            self.stats.leaves += 1
             return self.score(game, self), best_move
         
         if depth == 0:
+            self.stats.leaves += 1
             return self.score(game, self), legal_moves[0]
         else:
             for move in legal_moves:
-                if self.time_left() < self.TIMER_THRESHOLD:
-                    raise Timeout()
+                self.check_time()
                     
-                clone = game.forecast_move(move)
-                score, _ = self.minimax(clone, depth-1, not maximizing_player)
+                score = self.search_child(game, move, self.minimax,
+                                          depth-1, not maximizing_player)
                 if maximizing_player:
                     if score > best_score:
                         best_score = score
@@ -288,43 +1001,152 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
-        if self.time_left() <= self.TIMER_THRESHOLD:
-            raise Timeout()
+        self.check_time()
+        self.stats.nodes += 1
             
-        legal_moves = game.get_legal_moves(game.active_player)
+        if self.ordering:
+            legal_moves = game.get_legal_moves(game.active_player, shuffle=False)
+        else:
+            legal_moves = game.get_legal_moves(game.active_player)
+        if game.move_count < self.symmetry_plies:
+            legal_moves = self.unique_moves(game, legal_moves)
         best_score = float('-inf')
 
         if not maximizing_player:
             best_score = float('inf')
 
         if not legal_moves:
+            self.stats.leaves += 1
             return self.score(game, self), (-1, -1)
         best_move = legal_moves[0]
         
         if depth == 0:
+            self.stats.leaves += 1
             return self.score(game, self), best_move
 
-        else:
-            for move in legal_moves:
-                if self.time_left() <= self.TIMER_THRESHOLD:
-                    raise Timeout()
-                    
-                clone = game.forecast_move(move)
-                score, _ = self.alphabeta(clone, depth-1, alpha, beta, not maximizing_player)
-
-                if maximizing_player:
-                    if score > best_score:
-                        best_score = score
-                        best_move = move
-                    if score >= beta:
-                        return score, move
-                    alpha = max(alpha, score)
+        tt_move = None
+        if self.tt is not None:
+            key = game.zobrist if maximizing_player else game.zobrist ^ PERSPECTIVE_KEY
+            entry = self.tt.probe(key)
+            if entry is not None:
+                tt_move = entry.move
+            if entry is not None and entry.depth >= depth:
+                if entry.bound == EXACT:
+                    return entry.score, entry.move
+                elif entry.bound == LOWER:
+                    alpha = max(alpha, entry.score)
                 else:
-                    if score < best_score:
-                        best_score = score
-                        best_move = move
-                    if score <= alpha:
-                        return score, move
-                    beta = min(beta, score)
-                    
-        return best_score, best_move
\ No newline at end of file
+                    beta = min(beta, entry.score)
+                if alpha >= beta:
+                    return entry.score, entry.move
+            window = (alpha, beta)
+
+        if self.ordering:
+            legal_moves = self.order_moves(game, legal_moves, maximizing_player, tt_move)
+
+        pvs = self.method == 'pvs'
+        for idx, move in enumerate(legal_moves):
+            self.check_time()
+
+            if pvs and idx > 0:
+                score = self.scout_child(game, move, depth-1, alpha, beta, maximizing_player)
+            else:
+                score = self.search_child(game, move, self.alphabeta,
+                                          depth-1, alpha, beta, not maximizing_player)
+
+            if maximizing_player:
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                if score >= beta:
+                    best_score, best_move = score, move
+                    self.stats.cutoffs += 1
+                    self.stats.first_move_cutoffs += idx == 0
+                    if self.ordering:
+                        self.record_cutoff(game, move, depth, maximizing_player)
+                    break
+                alpha = max(alpha, score)
+            else:
+                if score < best_score:
+                    best_score = score
+                    best_move = move
+                if score <= alpha:
+                    best_score, best_move = score, move
+                    self.stats.cutoffs += 1
+                    self.stats.first_move_cutoffs += idx == 0
+                    if self.ordering:
+                        self.record_cutoff(game, move, depth, maximizing_player)
+                    break
+                beta = min(beta, score)
+
+        if self.tt is not None:
+            if best_score <= window[0]:
+                bound = UPPER
+            elif best_score >= window[1]:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.tt.store(key, depth, best_score, bound, best_move)
+
+        return best_score, best_move
+
+    def unique_moves(self, game, legal_moves):
+        """Return the legal moves without the moves that lead to a position
+        symmetric to the position reached by an earlier move in the list.
+        """
+        seen = set()
+        unique = []
+        for move in legal_moves:
+            key, _ = game.forecast_move(move).canonical()
+            if key not in seen:
+                seen.add(key)
+                unique.append(move)
+        return unique
+
+    def order_moves(self, game, legal_moves, maximizing_player, tt_move=None):
+        """Return the legal moves in the order alpha-beta should search them:
+        the transposition table (or principal variation) move, then the
+        killer moves recorded for this ply, then the remaining moves sorted
+        by their history score.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The current game state
+
+        legal_moves : list<(int, int)>
+            The legal moves of the active player
+
+        maximizing_player : bool
+            Flag indicating whether the current node is a maximizing layer
+
+        tt_move : (int, int) (optional)
+            The best move previously stored for this position, if any
+
+        Returns
+        ----------
+        list<(int, int)>
+            The legal moves reordered for search
+        """
+        history = self.history[maximizing_player]
+        ordered = sorted(legal_moves, key=lambda move: history.get(move, 0),
+                         reverse=True)
+        for move in reversed(self.killers.get(game.move_count, [])):
+            if move in ordered:
+                ordered.remove(move)
+                ordered.insert(0, move)
+        if tt_move in ordered:
+            ordered.remove(tt_move)
+            ordered.insert(0, tt_move)
+        return ordered
+
+    def record_cutoff(self, game, move, depth, maximizing_player):
+        """Update the killer moves and history table after `move` caused a
+        cutoff at a node searched to `depth`.
+        """
+        killers = self.killers.setdefault(game.move_count, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        history = self.history[maximizing_player]
+        history[move] = history.get(move, 0) + depth * depth
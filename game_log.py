@@ -0,0 +1,139 @@
+"""This file contains the game log of `tournament.py`: an append-only file
+with one JSON record per finished game, written as soon as its match is
+done, so that an interrupted tournament can be resumed and its results can
+be summarized again later.
+
+Each record has the keys
+
+    round : the name of the round, e.g., the name of the agent under test
+    agent : the name of the agent under test in the round
+    match : the index of the match in the schedule of the round
+    game : the index of the game in the match (0 or 1)
+    seed : the seed of the match
+    players : the names of the first and second player of the game
+    opening : the two random opening moves
+    moves : the moves the players made after the opening
+    winner : the name of the winner
+    termination : the reason the loser lost ("timeout", "forfeit", ...)
+    times : the milliseconds the players took for each of their moves
+"""
+import json
+import os
+
+from collections import OrderedDict
+
+GAMES_PER_MATCH = 2
+
+
+def read_records(path):
+    """Return the records of a game log, skipping a last line that was cut
+    short (e.g., by a crash while it was being written).
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+def latest_games(records):
+    """Return the latest record of each game of each complete match, keyed
+    by (round, match, game), in the order the matches were first logged.
+
+    A match is complete once all of its games are logged; the games of a
+    match that was played again after an interruption replace the earlier
+    ones.
+    """
+    games = OrderedDict()
+    for record in records:
+        games[record["round"], record["match"], record["game"]] = record
+    complete = {(r, m) for r, m, g in games
+                if all((r, m, i) in games for i in range(GAMES_PER_MATCH))}
+    return OrderedDict((key, record) for key, record in games.items()
+                       if key[:2] in complete)
+
+
+def summarize(records):
+    """Re-derive the result tables of `tournament.play_round()` from the
+    records of a game log.
+
+    Rounds without a single agent under test, such as the rating matches
+    of `tournament.play_rated()`, are skipped; see `ratings.py` for those.
+
+    Returns
+    ----------
+    list<(str, str, list<(str, int, int)>, float)>
+        For each round, its name, the name of the agent under test, the
+        number of games that agent won and lost against each opponent, and
+        its percentage of games won
+    """
+    rounds = OrderedDict()
+    for record in latest_games(records).values():
+        name = record["agent"]
+        opponent = [p for p in record["players"] if p != name][0]
+        agents, opponents = rounds.setdefault(record["round"],
+                                              (set(), OrderedDict()))
+        agents.add(name)
+        counts = opponents.setdefault(opponent, [0, 0])
+        counts[record["winner"] != name] += 1
+    summary = []
+    for round_name, (agents, opponents) in rounds.items():
+        if len(agents) != 1:
+            continue
+        rows = [(opponent, won, lost)
+                for opponent, (won, lost) in opponents.items()]
+        total = sum(won + lost for _, won, lost in rows)
+        wins = sum(won for _, won, _ in rows)
+        summary.append((round_name, agents.pop(), rows,
+                        100. * wins / total if total else 0.))
+    return summary
+
+
+class GameLog(object):
+    """Append game records to a log file, keeping track of the matches it
+    already holds so that a tournament can skip them when it is resumed.
+
+    Parameters
+    ----------
+    path : str
+        The path of the log; it is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.games = OrderedDict()
+        if os.path.exists(path):
+            records = read_records(path)
+            self.games = latest_games(records)
+            self._truncate(len(records))
+        self._file = open(path, "a")
+
+    def _truncate(self, num_records):
+        # drop a last line that was cut short, so new records start on a
+        # line of their own
+        with open(self.path, "r+") as f:
+            for _ in range(num_records):
+                f.readline()
+            f.truncate(f.tell())
+
+    def completed(self, round_name, match):
+        """Return the logged records of a complete match, or None."""
+        records = [self.games.get((round_name, match, game))
+                   for game in range(GAMES_PER_MATCH)]
+        return None if None in records else records
+
+    def append(self, records):
+        """Write the records of the games of one match and flush them."""
+        for record in records:
+            self.games[record["round"], record["match"],
+                       record["game"]] = record
+        self._file.write("".join(json.dumps(record, sort_keys=True) + "\n"
+                                 for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
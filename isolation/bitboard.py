@@ -0,0 +1,258 @@
+"""
+This file contains the `BitBoard` class, an alternative backend for the game
+Isolation that stores the game state in integer bitmasks instead of a Python
+list. It implements the same public interface as `isolation.Board`, so any
+agent written against `Board` can be played on a `BitBoard` unchanged.
+
+Squares are numbered the same way as in `Board` (index = row + col * height),
+and bit `i` of each mask corresponds to square `i`.
+"""
+from .geometry import get_geometry
+from .isolation import Board
+
+
+class BitBoard(Board):
+    """Implement the game Isolation with a bitboard representation.
+
+    Blocked cells are tracked in a single arbitrary-precision int and each
+    player's location is stored as a square index, so legal moves reduce to
+    masking the precomputed knight-move mask of the player's square with the
+    open cells rather than testing each candidate cell in turn.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        # Bit i of _blocked is set once square i has been occupied; the
+        # locations list holds the square index of player 1 and player 2
+        self._geometry = get_geometry(width, height)
+        self._blocked = 0
+        self._locations = [Board.NOT_MOVED, Board.NOT_MOVED]
+        self._undo_stack = []
+        self._zobrist = None
+        self._moves_cache = [None, None]
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = object.__new__(self.__class__)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._geometry = self._geometry
+        new_board._blocked = self._blocked
+        new_board._locations = list(self._locations)
+        new_board._undo_stack = []
+        new_board._zobrist = self._zobrist
+        new_board._moves_cache = list(self._moves_cache)
+        return new_board
+
+    def forecast_move(self, move):
+        """Return a deep copy of the current game with an input move applied to
+        advance the game one ply.
+
+        See `Board.forecast_move` for details.
+        """
+        # Build the child with the move already applied rather than copying
+        # state (e.g., the move cache) that apply_move() would throw away
+        idx = move[0] + move[1] * self.height
+        slot = self._active_player == self._player_2
+        new_board = object.__new__(self.__class__)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count + 1
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._inactive_player
+        new_board._inactive_player = self._active_player
+        new_board._geometry = self._geometry
+        new_board._blocked = self._blocked | 1 << idx
+        new_board._locations = locations = list(self._locations)
+        new_board._undo_stack = []
+        new_board._zobrist = self._zobrist
+        if self._zobrist is not None:
+            new_board._zobrist ^= self._zobrist_delta(slot, locations[slot], idx)
+        new_board._moves_cache = [None, None]
+        locations[slot] = idx
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._to_moves(self._geometry.full & ~self._blocked)
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._locations[self._player_index(player)]
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._geometry.coords[idx]
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        slot = self._active_player == self._player_2
+        if self._zobrist is not None:
+            self._zobrist ^= self._zobrist_delta(slot, self._locations[slot], idx)
+        self._locations[slot] = idx
+        self._blocked |= 1 << idx
+        self._moves_cache[0] = self._moves_cache[1] = None
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def push(self, move):
+        """Apply a move to the board in place so that pop() can undo it.
+
+        See `Board.push` for details.
+        """
+        self._undo_stack.append(
+            self._locations[self._active_player == self._player_2])
+        self.apply_move(move)
+
+    def pop(self):
+        """Undo the most recent move applied with push().
+
+        See `Board.pop` for details.
+        """
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        slot = self._active_player == self._player_2
+        idx = self._locations[slot]
+        prev_idx = self._undo_stack.pop()
+        if self._zobrist is not None:
+            self._zobrist ^= self._zobrist_delta(slot, prev_idx, idx)
+        self._locations[slot] = prev_idx
+        self._blocked ^= 1 << idx
+        self._moves_cache[0] = self._moves_cache[1] = None
+        return self._geometry.coords[idx]
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        p1_loc, p2_loc = self._locations
+
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._blocked >> idx & 1:
+                    out += ' '
+                elif p1_loc == idx:
+                    out += symbols[0]
+                elif p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    def _blocked_mask(self):
+        """Return a bitmask with bit i set for each blocked square i."""
+        return self._blocked
+
+    def _location_indices(self):
+        """Return the square index (or None) of player 1 and player 2."""
+        return tuple(self._locations)
+
+    def _generate_moves(self, slot):
+        """Return the tuple of legal moves for player 1 (slot 0) or player 2
+        (slot 1), in a fixed order.
+        """
+        bits = self._move_mask(slot)
+        move_tuples = self._geometry.move_tuples
+        moves = move_tuples.get(bits)
+        if moves is None:
+            moves = tuple(self._to_moves(bits))
+            # Only memoize the masks of knight jumps; the masks of the first
+            # move (every open square) are too many to be worth keeping
+            if self._locations[slot] != Board.NOT_MOVED:
+                move_tuples[bits] = moves
+        return moves
+
+    def _move_mask(self, slot):
+        """Return the mask of open squares the player in `slot` (0 for
+        player 1, 1 for player 2) can move to.
+        """
+        idx = self._locations[slot]
+        if idx == Board.NOT_MOVED:
+            return self._geometry.full & ~self._blocked
+        return self._geometry.neighbor_masks[idx] & ~self._blocked
+
+    def _to_moves(self, bits):
+        """Convert a mask of squares into a list of (row, column) pairs."""
+        coords = self._geometry.coords
+        moves = []
+        while bits:
+            low = bits & -bits
+            moves.append(coords[low.bit_length() - 1])
+            bits ^= low
+        return moves
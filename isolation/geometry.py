@@ -0,0 +1,165 @@
+"""
+This file contains precomputed knight-move tables for each board geometry.
+
+The tables only depend on the (width, height) of the board, so they are built
+once per geometry the first time a board of that size is created, and then
+shared by every board (and every copy of a board) with the same dimensions.
+
+Squares are numbered as in `isolation.Board` (index = row + col * height),
+and bit `i` of a mask corresponds to square `i`.
+"""
+import random
+
+from collections import namedtuple
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+Geometry = namedtuple("Geometry", ["width", "height", "full", "coords",
+                                   "shifts", "neighbors", "neighbor_masks",
+                                   "zobrist_blocked", "zobrist_players",
+                                   "zobrist_side", "symmetries",
+                                   "move_tuples"])
+
+_GEOMETRIES = {}
+
+
+def knight_shifts(width, height):
+    """Return the (shift, source mask) pair for each knight direction.
+
+    Shifting a set of squares left by `shift` (or right, when the shift is
+    negative) moves every square one knight jump in that direction; the
+    source mask selects the squares for which that jump stays on the board.
+    """
+    shifts = []
+    for dr, dc in DIRECTIONS:
+        mask = 0
+        for c in range(max(0, -dc), min(width, width - dc)):
+            for r in range(max(0, -dr), min(height, height - dr)):
+                mask |= 1 << (r + c * height)
+        shifts.append((dr + dc * height, mask))
+    return shifts
+
+
+def knight_attacks(bits, shifts):
+    """Return the mask of squares one knight jump away from any square in
+    `bits`.
+    """
+    attacks = 0
+    for shift, mask in shifts:
+        src = bits & mask
+        if src:
+            attacks |= src << shift if shift > 0 else src >> -shift
+    return attacks
+
+
+def flood_fill(bits, open_bits, shifts):
+    """Return the mask of squares in `open_bits` that can be reached from
+    any square in `bits` by a sequence of knight jumps that only lands on
+    squares in `open_bits`.
+    """
+    region = 0
+    frontier = knight_attacks(bits, shifts) & open_bits
+    while frontier:
+        region |= frontier
+        frontier = knight_attacks(frontier, shifts) & open_bits & ~region
+    return region
+
+
+def board_symmetries(width, height):
+    """Return the square permutation of each symmetry of the board.
+
+    Knight moves are preserved by reflecting the board in its middle row or
+    middle column, and on square boards also by reflecting it in a diagonal,
+    so rectangular boards have 4 symmetries and square boards have 8. Entry
+    `idx` of each permutation is the square that square `idx` is mapped to;
+    the first permutation is the identity.
+    """
+    transforms = [lambda r, c: (r, c),
+                  lambda r, c: (height - 1 - r, c),
+                  lambda r, c: (r, width - 1 - c),
+                  lambda r, c: (height - 1 - r, width - 1 - c)]
+    if width == height:
+        transforms += [lambda r, c, f=f: f(c, r) for f in transforms]
+    symmetries = []
+    for transform in transforms:
+        perm = []
+        for idx in range(width * height):
+            r, c = transform(idx % height, idx // height)
+            perm.append(r + c * height)
+        symmetries.append(tuple(perm))
+    return symmetries
+
+
+def mask_to_indices(bits):
+    """Return the square indices of the set bits in `bits`, in order."""
+    indices = []
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+def get_geometry(width, height):
+    """Return the (cached) knight-move tables for a board of the given size.
+
+    Returns
+    ----------
+    Geometry
+        full : int
+            A mask with one bit set for every square on the board
+
+        coords : list<(int, int)>
+            The (row, column) pair of each square index
+
+        shifts : list<(int, int)>
+            The (shift, source mask) pairs returned by `knight_shifts()`
+
+        neighbors : list<tuple(int)>
+            The indices of the squares one knight jump away from each square
+
+        neighbor_masks : list<int>
+            The same neighbor sets encoded as bitmasks
+
+        zobrist_blocked : list<int>
+            A 64-bit Zobrist key for each square being blocked
+
+        zobrist_players : (list<int>, list<int>)
+            A 64-bit Zobrist key for player 1 and for player 2 occupying
+            each square
+
+        zobrist_side : int
+            The 64-bit Zobrist key toggled when player 2 is to move
+
+        symmetries : list<tuple(int)>
+            The square permutations returned by `board_symmetries()`
+
+        move_tuples : dict<int, tuple((int, int))>
+            A memo from a mask of squares to the tuple of their (row, column)
+            pairs, filled lazily by `BitBoard` as masks are first seen
+    """
+    geometry = _GEOMETRIES.get((width, height))
+    if geometry is None:
+        shifts = knight_shifts(width, height)
+        size = width * height
+        masks = [knight_attacks(1 << idx, shifts) for idx in range(size)]
+        # Seed the keys from the geometry so that hashes are reproducible
+        # across processes (e.g., for tables stored on disk)
+        rng = random.Random("zobrist-{}x{}".format(width, height))
+        geometry = Geometry(
+            width=width,
+            height=height,
+            full=(1 << size) - 1,
+            coords=[(idx % height, idx // height) for idx in range(size)],
+            shifts=shifts,
+            neighbors=[tuple(mask_to_indices(mask)) for mask in masks],
+            neighbor_masks=masks,
+            zobrist_blocked=[rng.getrandbits(64) for _ in range(size)],
+            zobrist_players=([rng.getrandbits(64) for _ in range(size)],
+                             [rng.getrandbits(64) for _ in range(size)]),
+            zobrist_side=rng.getrandbits(64),
+            symmetries=board_symmetries(width, height),
+            move_tuples={})
+        _GEOMETRIES[(width, height)] = geometry
+    return geometry
@@ -11,6 +11,10 @@ import random
 import timeit
 from copy import copy
 
+from .geometry import flood_fill
+from .geometry import get_geometry
+from .geometry import mask_to_indices
+
 TIME_LIMIT_MILLIS = 150
 
 
@@ -52,8 +56,106 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Knight-move neighbor tables shared by all boards of this size
+        self._geometry = get_geometry(width, height)
+
+        # Previous locations of the moving player for each push(), so that
+        # pop() can undo moves in place
+        self._undo_stack = []
+
+        # Zobrist hash of the board; computed on first use, then updated
+        # incrementally by apply_move() and pop()
+        self._zobrist = None
+
+        # Legal moves of player 1 and player 2 in the current state; each
+        # entry is computed on first use and cleared whenever a move is
+        # applied or undone
+        self._moves_cache = [None, None]
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        return self.zobrist
+
+    @property
+    def zobrist(self):
+        """A 64-bit Zobrist hash of the current game state covering the
+        blocked cells, the location of each player and the side to move.
+        """
+        if self._zobrist is None:
+            geometry = self._geometry
+            zobrist = 0
+            for idx in mask_to_indices(self._blocked_mask()):
+                zobrist ^= geometry.zobrist_blocked[idx]
+            for keys, idx in zip(geometry.zobrist_players,
+                                 self._location_indices()):
+                if idx != Board.NOT_MOVED:
+                    zobrist ^= keys[idx]
+            if self._active_player == self._player_2:
+                zobrist ^= geometry.zobrist_side
+            self._zobrist = zobrist
+        return self._zobrist
+
+    def canonical(self):
+        """Return a hash of the game state that is the same for every state
+        related to it by a symmetry of the board (see
+        `geometry.board_symmetries`), together with the symmetry that maps
+        this state to the canonical one.
+
+        Returns
+        ----------
+        int
+            The smallest Zobrist hash over all symmetric images of the state
+
+        int
+            The index of the symmetry mapping this state to the image with
+            the smallest hash, e.g., for `transform_move()`
+        """
+        geometry = self._geometry
+        blocked = mask_to_indices(self._blocked_mask())
+        locations = [(keys, idx) for keys, idx in
+                     zip(geometry.zobrist_players, self._location_indices())
+                     if idx != Board.NOT_MOVED]
+        side = 0
+        if self._active_player == self._player_2:
+            side = geometry.zobrist_side
+        zobrist_blocked = geometry.zobrist_blocked
+        best_key, best_transform = None, None
+        for transform, perm in enumerate(geometry.symmetries):
+            key = side
+            for idx in blocked:
+                key ^= zobrist_blocked[perm[idx]]
+            for keys, idx in locations:
+                key ^= keys[perm[idx]]
+            if best_key is None or key < best_key:
+                best_key, best_transform = key, transform
+        return best_key, best_transform
+
+    def transform_move(self, move, transform, inverse=False):
+        """Map a move through one of the board symmetries.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) on the board.
+
+        transform : int
+            The index of the symmetry, as returned by `canonical()`.
+
+        inverse : bool (optional)
+            Flag indicating whether to apply the inverse of the symmetry,
+            e.g., to map a move from the canonical state back to this one.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the mapped move.
+        """
+        perm = self._geometry.symmetries[transform]
+        idx = move[0] + move[1] * self.height
+        if inverse:
+            idx = perm.index(idx)
+        else:
+            idx = perm[idx]
+        return self._geometry.coords[idx]
 
     @property
     def active_player(self):
@@ -97,6 +199,8 @@ class Board(object):
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._zobrist = self._zobrist
+        new_board._moves_cache = list(self._moves_cache)
         return new_board
 
     def forecast_move(self, move):
@@ -171,7 +275,7 @@ class Board(object):
         h = idx % self.height
         return (h, w)
 
-    def get_legal_moves(self, player=None):
+    def get_legal_moves(self, player=None, shuffle=True):
         """Return the list of all legal moves for the specified player.
 
         Parameters
@@ -180,6 +284,11 @@ class Board(object):
             An object registered as a player in the current game. If None,
             return the legal moves for the active player on the board.
 
+        shuffle : bool (optional)
+            Flag indicating whether the moves are returned in random order
+            (True) or in a fixed order (False), e.g., for searches that sort
+            the moves themselves.
+
         Returns
         -------
         list<(int, int)>
@@ -188,7 +297,10 @@ class Board(object):
         """
         if player is None:
             player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        valid_moves = list(self._legal_moves(player))
+        if shuffle:
+            random.shuffle(valid_moves)
+        return valid_moves
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -201,19 +313,94 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        if self._zobrist is not None:
+            self._zobrist ^= self._zobrist_delta(
+                last_move_idx - 1, self._board_state[-last_move_idx], idx)
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
+        self._moves_cache[0] = self._moves_cache[1] = None
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def push(self, move):
+        """Apply a move to the board in place, remembering enough state for
+        pop() to undo it. Unlike forecast_move(), no new board is created, so
+        a search can make and unmake moves on a single board.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        self._undo_stack.append(self._board_state[-last_move_idx])
+        self.apply_move(move)
+
+    def pop(self):
+        """Undo the most recent move applied with push().
+
+        Moves applied with apply_move() cannot be undone, and copies of the
+        board start with an empty undo stack.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        prev_idx = self._undo_stack.pop()
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        idx = self._board_state[-last_move_idx]
+        if self._zobrist is not None:
+            self._zobrist ^= self._zobrist_delta(last_move_idx - 1, prev_idx, idx)
+        self._board_state[-last_move_idx] = prev_idx
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-3] ^= 1
+        self._moves_cache[0] = self._moves_cache[1] = None
+        return self._geometry.coords[idx]
+
+    def reachable(self, player):
+        """Return the mask of open squares (bit i for square i) that the
+        player could still reach in any number of moves if the opponent
+        stopped moving.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        int
+            The bitmask of reachable squares; every open square if the
+            player has not moved yet.
+        """
+        geometry = self._geometry
+        open_bits = geometry.full & ~self._blocked_mask()
+        idx = self._location_indices()[self._player_index(player)]
+        if idx == Board.NOT_MOVED:
+            return open_bits
+        return flood_fill(1 << idx, open_bits, geometry.shifts)
+
+    def is_partitioned(self):
+        """Test whether the players can no longer reach a common square, so
+        that neither player's moves can affect the other's.
+        """
+        p1_idx, p2_idx = self._location_indices()
+        if p1_idx == Board.NOT_MOVED or p2_idx == Board.NOT_MOVED:
+            return False
+        return not self.reachable(self._player_1) & self.reachable(self._player_2)
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self._legal_moves(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self._legal_moves(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,7 +424,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self._legal_moves(self._active_player):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -247,21 +434,65 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def _legal_moves(self, player):
+        """Return the (memoized) tuple of legal moves for the player in a
+        fixed order.
+        """
+        slot = self._player_index(player)
+        moves = self._moves_cache[slot]
+        if moves is None:
+            moves = self._moves_cache[slot] = self._generate_moves(slot)
+        return moves
+
+    def _generate_moves(self, slot):
+        """Return the tuple of legal moves for player 1 (slot 0) or player 2
+        (slot 1), in a fixed order.
+        """
+        return tuple(self.__get_moves(self._board_state[-1 - slot]))
+
+    def _player_index(self, player):
+        """Return 0 for player 1 and 1 for player 2."""
+        if player == self._player_1:
+            return 0
+        elif player == self._player_2:
+            return 1
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+
+    def _blocked_mask(self):
+        """Return a bitmask with bit i set for each blocked square i."""
+        board_state = self._board_state
+        mask = 0
+        for idx in range(self.width * self.height):
+            if board_state[idx] != Board.BLANK:
+                mask |= 1 << idx
+        return mask
+
+    def _location_indices(self):
+        """Return the square index (or None) of player 1 and player 2."""
+        return self._board_state[-1], self._board_state[-2]
+
+    def _zobrist_delta(self, slot, prev_idx, idx):
+        """Return the Zobrist keys toggled when the player in `slot` (0 for
+        player 1, 1 for player 2) moves from `prev_idx` to `idx`.
+        """
+        geometry = self._geometry
+        keys = geometry.zobrist_players[slot]
+        delta = geometry.zobrist_blocked[idx] ^ keys[idx] ^ geometry.zobrist_side
+        if prev_idx != Board.NOT_MOVED:
+            delta ^= keys[prev_idx]
+        return delta
+
+    def __get_moves(self, loc_idx):
         """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        knight in chess) from the square index `loc_idx`.
         """
-        if loc == Board.NOT_MOVED:
+        if loc_idx == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
-        # print("INSIDE islation.py: valid_moves are:{}".format(valid_moves))
-        return valid_moves
+        board_state = self._board_state
+        coords = self._geometry.coords
+        return [coords[idx] for idx in self._geometry.neighbors[loc_idx]
+                if board_state[idx] == Board.BLANK]
 
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
@@ -296,7 +527,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, move_times=None):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -306,6 +537,10 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        move_times : list (optional)
+            If given, the number of milliseconds each player took for each
+            turn is appended to this list.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -327,6 +562,8 @@ class Board(object):
             curr_move = self._active_player.get_move(
                 game_copy, legal_player_moves, time_left)
             move_end = time_left()
+            if move_times is not None:
+                move_times.append(time_limit - move_end)
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
@@ -0,0 +1,231 @@
+"""This file contains a small job queue for spreading tournament matches over
+several machines. A `Coordinator` listens on a TCP socket and hands out jobs
+(a function and its arguments) to any number of workers started with
+`run_worker()`, which call the function and send back the result.
+
+A job handed out to a worker is leased rather than removed: if the worker
+does not report back before the lease expires (e.g., because it crashed or
+lost its connection), the job is handed out again. Results are kept by job,
+so a late result from a worker whose lease expired is simply ignored.
+
+The coordinator has the same `apply_async()` interface as a
+`multiprocessing.Pool`, so `tournament.play_round()` can use either one.
+
+Jobs and results are sent as pickles, and unpickling can run arbitrary
+code, so anyone who knows the authkey can take over the coordinator or the
+workers. The default authkey is only accepted for loopback addresses; any
+other address needs a secret authkey and should only be reachable from
+trusted machines.
+"""
+import collections
+import ipaddress
+import time
+
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from multiprocessing.connection import Listener
+
+AUTHKEY = b"isolation"  # only accepted on loopback addresses
+LEASE = 120.  # seconds before a job handed to a worker is handed out again
+POLL_INTERVAL = 1.  # seconds a worker waits when all jobs are leased
+REQUEST_TIMEOUT = 10.  # seconds the coordinator waits for a request
+
+
+def parse_address(address):
+    """Split a "host:port" string into a (host, port) pair."""
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def is_loopback(address):
+    """Test whether a (host, port) address can only be reached from this
+    machine.
+    """
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_authkey(address, authkey):
+    """Return the authkey to use for an address: the default authkey for
+    loopback addresses if none is given.
+
+    Raises
+    ----------
+    ValueError
+        If no authkey, or the default one, is given for an address that is
+        reachable from other machines
+    """
+    if authkey is None:
+        authkey = AUTHKEY
+    if authkey == AUTHKEY and not is_loopback(address):
+        raise ValueError("{}:{} is not a loopback address; choose a secret "
+                         "authkey".format(*address))
+    return authkey
+
+
+class AsyncResult(object):
+    """The result of a job submitted to a `Coordinator`; `get()` serves
+    workers until the job is done.
+    """
+
+    def __init__(self, coordinator, job_id):
+        self._coordinator = coordinator
+        self._job_id = job_id
+
+    def ready(self):
+        return self._job_id in self._coordinator.results
+
+    def get(self):
+        return self._coordinator.result(self._job_id)
+
+
+class Coordinator(object):
+    """Hand out jobs to remote workers and collect their results.
+
+    The coordinator is single threaded: requests from workers are only
+    served while waiting on a result, i.e., inside `AsyncResult.get()`.
+    Workers started on the same machine must not be forked from the
+    coordinator process, or they inherit its listening socket.
+
+    Parameters
+    ----------
+    address : tuple(str, int) (optional)
+        The address to listen on; port 0 picks a free port.
+
+    authkey : bytes (optional)
+        The shared secret that workers must present; required unless the
+        address is a loopback address (see `check_authkey()`).
+
+    lease : float (optional)
+        The number of seconds a worker has to return the result of a job.
+    """
+
+    def __init__(self, address=("localhost", 0), authkey=None, lease=LEASE):
+        authkey = check_authkey(address, authkey)
+        self.lease = lease
+        self.results = {}
+        self._listener = Listener(address, authkey=authkey)
+        self._jobs = {}
+        self._pending = collections.deque()
+        self._leases = {}
+        self._next_id = 0
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    def apply_async(self, func, args=()):
+        """Queue a call to `func(*args)` on a worker.
+
+        Returns
+        ----------
+        AsyncResult
+            A handle to wait for the result of the call
+        """
+        job_id = self._next_id
+        self._next_id += 1
+        self._jobs[job_id] = (func, tuple(args))
+        self._pending.append(job_id)
+        return AsyncResult(self, job_id)
+
+    def result(self, job_id):
+        """Serve workers until the job is done and return its result."""
+        while job_id not in self.results:
+            self.serve_one()
+        return self.results[job_id]
+
+    def serve_one(self):
+        """Accept a connection from a worker and answer its request."""
+        try:
+            conn = self._listener.accept()
+        except (AuthenticationError, EOFError, OSError):
+            # e.g., a client that failed authentication
+            return
+        with conn:
+            try:
+                if not conn.poll(REQUEST_TIMEOUT):
+                    return
+                request = conn.recv()
+                if request[0] == "get":
+                    conn.send(self._next_job())
+                elif request[0] == "result":
+                    _, job_id, value = request
+                    if job_id in self._jobs and job_id not in self.results:
+                        self.results[job_id] = value
+                        self._leases.pop(job_id, None)
+                    conn.send(("ok",))
+            except (EOFError, OSError):
+                # the worker went away; its lease will expire
+                pass
+
+    def _next_job(self):
+        now = time.monotonic()
+        for job_id, deadline in list(self._leases.items()):
+            if deadline <= now:
+                del self._leases[job_id]
+                self._pending.appendleft(job_id)
+        while self._pending:
+            job_id = self._pending.popleft()
+            if job_id in self.results:
+                continue
+            self._leases[job_id] = now + self.lease
+            func, args = self._jobs[job_id]
+            return ("job", job_id, func, args)
+        if self._leases:
+            return ("wait", min(POLL_INTERVAL, min(self._leases.values()) - now))
+        return ("wait", POLL_INTERVAL)
+
+    def close(self):
+        """Stop listening; workers exit once they find the coordinator gone."""
+        self._listener.close()
+
+
+def _request(address, authkey, message):
+    with Client(address, authkey=authkey) as conn:
+        conn.send(message)
+        return conn.recv()
+
+
+def run_worker(address, authkey=None, max_jobs=None):
+    """Run jobs from a coordinator until it shuts down.
+
+    Parameters
+    ----------
+    address : tuple(str, int)
+        The address of the coordinator.
+
+    authkey : bytes (optional)
+        The shared secret of the coordinator; required unless the address
+        is a loopback address (see `check_authkey()`).
+
+    max_jobs : int (optional)
+        Return after running this many jobs.
+
+    Returns
+    ----------
+    int
+        The number of jobs run
+    """
+    authkey = check_authkey(address, authkey)
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        try:
+            reply = _request(address, authkey, ("get",))
+        except (ConnectionError, EOFError):
+            break
+        if reply[0] == "wait":
+            time.sleep(max(reply[1], 0.))
+            continue
+        _, job_id, func, args = reply
+        value = func(*args)
+        count += 1
+        try:
+            _request(address, authkey, ("result", job_id, value))
+        except (ConnectionError, EOFError):
+            break
+    return count
@@ -0,0 +1,138 @@
+"""This file contains an opening book for Isolation: an offline builder that
+searches every position of the first few plies (one position per symmetry
+class, see `isolation.Board.canonical`) and writes the best move of each to
+a compact binary file, and a reader that looks moves up by position hash.
+
+For example, to search the first 2 plies of the 7x7 game to depth 5:
+
+    python opening_book.py 7 7 2 5 book_7x7.bin
+"""
+import argparse
+import struct
+
+from isolation import Board
+from isolation.geometry import get_geometry
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+MAGIC = b"ISOOB1"
+
+# magic, width, height, number of records
+HEADER = struct.Struct("<6sBBI")
+
+# canonical position hash, square index of the best move in the canonical
+# image of the position
+RECORD = struct.Struct("<QH")
+
+
+def build_book(width, height, plies, depth, score_fn=improved_score):
+    """Search the best move of every position with fewer than `plies` moves
+    played.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board.
+
+    plies : int
+        The number of plies covered by the book.
+
+    depth : int
+        The depth of the alpha-beta search from each position.
+
+    score_fn : callable (optional)
+        The heuristic used by the search.
+
+    Returns
+    ----------
+    dict
+        The square index of the best move in the canonical image of each
+        position, keyed by the canonical position hash.
+    """
+    players = [CustomPlayer(depth, score_fn, False, "alphabeta",
+                            symmetry_plies=plies) for _ in range(2)]
+    for player in players:
+        player.time_left = lambda: float("inf")
+    book = {}
+    frontier = [Board(players[0], players[1], width, height)]
+    for _ in range(plies):
+        next_frontier = []
+        for game in frontier:
+            key, transform = game.canonical()
+            if key in book:
+                continue
+            _, move = game.active_player.alphabeta(game, depth)
+            row, col = game.transform_move(move, transform)
+            book[key] = row + col * height
+            replies = players[0].unique_moves(game, game.get_legal_moves())
+            next_frontier.extend(game.forecast_move(move) for move in replies)
+        frontier = next_frontier
+    return book
+
+
+def write_book(path, width, height, plies, depth, score_fn=improved_score):
+    """Build an opening book and write it to `path`; returns the number of
+    positions written.
+    """
+    book = build_book(width, height, plies, depth, score_fn)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, len(book)))
+        for key in sorted(book):
+            f.write(RECORD.pack(key, book[key]))
+    return len(book)
+
+
+class OpeningBook(object):
+    """Look up book moves in a file written by `write_book()`.
+
+    Parameters
+    ----------
+    path : str
+        The path of the opening book file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, self.width, self.height, size = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an opening book file: {}".format(path))
+        self._moves = dict(RECORD.iter_unpack(
+            data[HEADER.size:HEADER.size + size * RECORD.size]))
+
+    def __len__(self):
+        return len(self._moves)
+
+    def lookup(self, game):
+        """Return the book move for the game state, or None if the state is
+        not in the book.
+        """
+        if game.width != self.width or game.height != self.height:
+            return None
+        key, transform = game.canonical()
+        idx = self._moves.get(key)
+        if idx is None:
+            return None
+        coords = get_geometry(self.width, self.height).coords
+        move = game.transform_move(coords[idx], transform, inverse=True)
+        return move if move in game.get_legal_moves() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an Isolation opening book.")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("plies", type=int,
+                        help="the number of plies covered by the book")
+    parser.add_argument("depth", type=int,
+                        help="the search depth from each book position")
+    parser.add_argument("path", help="the output file")
+    args = parser.parse_args()
+    count = write_book(args.path, args.width, args.height, args.plies,
+                       args.depth)
+    print("Wrote {} positions to {}".format(count, args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""This file contains a rating engine for any set of agents: it fits
+Bradley-Terry strengths to the games in a game log (see `game_log.py`) and
+reports them on the Elo scale with confidence intervals, so that agents can
+be compared across tournaments instead of only by their win percentage
+against a fixed list of opponents.
+
+Under the Bradley-Terry model an agent with strength a beats an agent with
+strength b with probability 1 / (1 + exp(b - a)); an Elo rating is the
+strength times 400 / ln(10). The strengths are fit by maximum a posteriori
+estimation with a weak Gaussian prior centered on 0 Elo, which keeps the
+ratings of agents that won or lost every game finite; the confidence
+intervals come from the curvature of the posterior at its peak.
+
+For example, to rate all agents in a game log:
+
+    python ratings.py games.jsonl
+"""
+import argparse
+import itertools
+import math
+
+from game_log import latest_games
+from game_log import read_records
+
+ELO_SCALE = 400. / math.log(10.)
+PRIOR_ELO = 500.  # standard deviation of the prior on each rating
+
+
+def _invert(matrix):
+    """Return the inverse of a symmetric positive definite matrix given as
+    a list of rows (Gauss-Jordan elimination).
+    """
+    size = len(matrix)
+    rows = [list(row) + [float(i == j) for j in range(size)]
+            for i, row in enumerate(matrix)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = rows[col][col]
+        rows[col] = [x / scale for x in rows[col]]
+        for r in range(size):
+            factor = rows[r][col]
+            if r != col and factor:
+                rows[r] = [x - factor * y for x, y in zip(rows[r], rows[col])]
+    return [row[size:] for row in rows]
+
+
+class Ratings(object):
+    """Bradley-Terry ratings of a growing set of agents.
+
+    Games can be added at any time; the ratings are fit again, starting
+    from the previous fit, the next time they are read.
+
+    Parameters
+    ----------
+    prior_elo : float (optional)
+        The standard deviation of the prior on each rating, in Elo.
+    """
+
+    def __init__(self, prior_elo=PRIOR_ELO):
+        self.prior = 1. / (prior_elo / ELO_SCALE) ** 2
+        self.names = []
+        self._index = {}
+        self._wins = {}
+        self._strength = []
+        self._covariance = []
+        self._fitted = True
+
+    def add_agent(self, name):
+        """Add an agent without games; returns its index."""
+        idx = self._index.get(name)
+        if idx is None:
+            idx = self._index[name] = len(self.names)
+            self.names.append(name)
+            self._strength.append(0.)
+            self._fitted = False
+        return idx
+
+    def add_game(self, winner, loser):
+        """Add a game won by the agent named `winner`."""
+        key = (self.add_agent(winner), self.add_agent(loser))
+        self._wins[key] = self._wins.get(key, 0) + 1
+        self._fitted = False
+
+    def add_records(self, records):
+        """Add every game of a list of game log records."""
+        for record in records:
+            loser = [p for p in record["players"] if p != record["winner"]]
+            self.add_game(record["winner"], loser[0])
+
+    def games(self, name):
+        """Return the number of games played by an agent."""
+        idx = self._index[name]
+        return sum(n for (w, l), n in self._wins.items() if idx in (w, l))
+
+    def _derivatives(self, theta):
+        # the gradient and the negated Hessian of the log posterior
+        size = len(theta)
+        grad = [-self.prior * t for t in theta]
+        info = [[self.prior * (i == j) for j in range(size)]
+                for i in range(size)]
+        for (w, l), n in self._wins.items():
+            p = 1. / (1. + math.exp(theta[l] - theta[w]))
+            grad[w] += n * (1. - p)
+            grad[l] -= n * (1. - p)
+            weight = n * p * (1. - p)
+            info[w][w] += weight
+            info[l][l] += weight
+            info[w][l] -= weight
+            info[l][w] -= weight
+        return grad, info
+
+    def fit(self, max_iter=50, tol=1e-9):
+        """Fit the strengths by Newton's method on the log posterior."""
+        theta = self._strength
+        for _ in range(max_iter):
+            grad, info = self._derivatives(theta)
+            step = [sum(c * g for c, g in zip(row, grad))
+                    for row in _invert(info)]
+            theta = [t + s for t, s in zip(theta, step)]
+            if max(map(abs, step), default=0.) < tol:
+                break
+        self._strength = theta
+        self._covariance = _invert(self._derivatives(theta)[1])
+        self._fitted = True
+
+    def _fit(self):
+        if not self._fitted:
+            self.fit()
+
+    def rating(self, name):
+        """Return the Elo rating of an agent."""
+        self._fit()
+        return self._strength[self._index[name]] * ELO_SCALE
+
+    def interval(self, name, z=1.96):
+        """Return the (low, high) confidence interval of the Elo rating of
+        an agent; the default `z` gives a 95% interval.
+
+        Only differences between ratings are measured by games, so the
+        interval is that of the difference between the rating of the agent
+        and the average rating of all agents.
+        """
+        self._fit()
+        idx = self._index[name]
+        cov = self._covariance
+        size = len(cov)
+        # the variance of theta[idx] - mean(theta)
+        variance = (cov[idx][idx] - 2. * sum(cov[idx]) / size +
+                    sum(map(sum, cov)) / size ** 2)
+        margin = z * math.sqrt(max(variance, 0.)) * ELO_SCALE
+        rating = self._strength[idx] * ELO_SCALE
+        return rating - margin, rating + margin
+
+    def expected_score(self, name_1, name_2):
+        """Return the probability that the first agent beats the second."""
+        diff = self.rating(name_2) - self.rating(name_1)
+        return 1. / (1. + math.exp(diff / ELO_SCALE))
+
+    def table(self):
+        """Return (name, rating, low, high, games) for each agent, from the
+        highest rating to the lowest.
+        """
+        rows = [(name, self.rating(name)) + self.interval(name) +
+                (self.games(name),) for name in self.names]
+        return sorted(rows, key=lambda row: -row[1])
+
+    def pairings(self, count=1, names=None):
+        """Return the `count` pairs of agents whose next game is expected to
+        tell the most about their relative strength, among the agents named
+        in `names` (default: all agents).
+
+        A game between two agents is worth the Fisher information it adds,
+        p * (1 - p) for a win probability p, times the current variance of
+        the difference between their ratings: agents of similar strength
+        whose difference is still uncertain are paired first.
+        """
+        self._fit()
+        gains = []
+        cov = self._covariance
+        if names is None:
+            names = self.names
+        indices = sorted(self._index[name] for name in names)
+        for i, j in itertools.combinations(indices, 2):
+            p = 1. / (1. + math.exp(self._strength[j] - self._strength[i]))
+            variance = cov[i][i] + cov[j][j] - 2. * cov[i][j]
+            gains.append((p * (1. - p) * variance, i, j))
+        gains.sort(key=lambda gain: -gain[0])
+        return [(self.names[i], self.names[j]) for _, i, j in gains[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rate the agents of an Isolation game log.")
+    parser.add_argument("path", help="a game log written by tournament.py")
+    args = parser.parse_args()
+    ratings = Ratings()
+    ratings.add_records(latest_games(read_records(args.path)).values())
+    print("{:<15}{:>8}{:>18}{:>8}".format("Agent", "Elo", "95% CI", "Games"))
+    for name, rating, low, high, games in ratings.table():
+        print("{!s:<15}{:>8.1f}   [{:>6.1f}, {:>6.1f}]{:>8}".format(
+            name, rating, low, high, games))
+
+
+if __name__ == "__main__":
+    main()
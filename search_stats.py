@@ -0,0 +1,98 @@
+"""This file contains the counters that `game_agent.CustomPlayer` keeps
+about each search, so that search regressions show up in tournament logs
+and time controls can be tuned from real games. The counters are plain
+integer increments, cheap enough to leave on in every game.
+"""
+import json
+import time
+
+
+class SearchStats(object):
+    """Counters for one call to `CustomPlayer.get_move()`.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of positions searched by `CustomPlayer.minimax()` or
+        `CustomPlayer.alphabeta()`.
+
+    leaves : int
+        The number of heuristic evaluations made by the search.
+
+    cutoffs : int
+        The number of alpha-beta cutoffs.
+
+    first_move_cutoffs : int
+        The number of cutoffs caused by the first move searched at a node.
+
+    iterations : list<(int, int, float)>
+        The depth, number of nodes and seconds of each completed iterative
+        deepening iteration (or of the fixed-depth search).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Zero the counters and start the clock of a new search."""
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations = []
+        self.start = time.perf_counter()
+        self.end = None
+        self._iteration_start = (self.start, 0)
+
+    def end_iteration(self, depth):
+        """Record that the search to `depth` plies has completed."""
+        now = time.perf_counter()
+        start, nodes = self._iteration_start
+        self.iterations.append((depth, self.nodes - nodes, now - start))
+        self._iteration_start = (now, self.nodes)
+
+    def finish(self):
+        """Stop the clock of the search."""
+        self.end = time.perf_counter()
+
+    def as_dict(self):
+        """Return the counters and the statistics derived from them.
+
+        Returns
+        ----------
+        dict
+            depth : the deepest completed iteration (0 if none completed)
+            nodes, leaves, cutoffs : the raw counters
+            time : the seconds spent in the search
+            nps : the number of nodes searched per second
+            ebf : the effective branching factor, i.e., the ratio of the
+                nodes of the last two completed iterations (or the depth-th
+                root of the nodes of a single one)
+            first_move_cutoff_rate : the fraction of cutoffs caused by the
+                first move searched, a measure of move ordering quality
+            iterations : a dict of the depth, nodes and time of each
+                completed iteration
+        """
+        elapsed = (self.end or time.perf_counter()) - self.start
+        ebf = 0.
+        if len(self.iterations) > 1 and self.iterations[-2][1]:
+            ebf = self.iterations[-1][1] / self.iterations[-2][1]
+        elif self.iterations and self.iterations[-1][0]:
+            ebf = self.iterations[-1][1] ** (1. / self.iterations[-1][0])
+        return {
+            "depth": self.iterations[-1][0] if self.iterations else 0,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "time": elapsed,
+            "nps": self.nodes / elapsed if elapsed > 0 else 0.,
+            "ebf": ebf,
+            "first_move_cutoff_rate": (self.first_move_cutoffs / self.cutoffs
+                                       if self.cutoffs else 0.),
+            "iterations": [{"depth": depth, "nodes": nodes, "time": seconds}
+                           for depth, nodes, seconds in self.iterations],
+        }
+
+    def to_json(self):
+        """Return `as_dict()` as a single line of JSON."""
+        return json.dumps(self.as_dict(), sort_keys=True)
@@ -0,0 +1,834 @@
+"""
+This file contains test cases for the optional search features of
+`game_agent.CustomPlayer`. Each feature is checked against the plain
+minimax/alpha-beta search that agent_test.py verifies.
+"""
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import endgame
+import game_agent
+import isolation
+import opening_book
+import tablebase
+import transposition
+
+from sample_players import improved_score
+
+
+def random_position(backend, agent, num_moves, w=7, h=7):
+    """Return a board with `agent` as player 1 after `num_moves` random
+    moves, or None if the game ended first.
+    """
+    board = backend(agent, "opponent", w, h)
+    for _ in range(num_moves):
+        moves = board.get_legal_moves()
+        if not moves:
+            return None
+        board.apply_move(random.choice(moves))
+    return board if board.get_legal_moves() else None
+
+
+class InplaceSearchTest(unittest.TestCase):
+
+    def test_inplace_search_scores(self):
+        """Make/unmake search returns the same scores as copy-based search"""
+        for backend in (isolation.Board, isolation.BitBoard):
+            for num_moves in (2, 6, 10, 14):
+                agent = game_agent.CustomPlayer(4, improved_score, False)
+                agent.time_left = lambda: 1e3
+                board = random_position(backend, agent, num_moves)
+                if board is None:
+                    continue
+                before = board.to_string()
+                for method in ("minimax", "alphabeta"):
+                    agent.inplace = False
+                    expected, _ = getattr(agent, method)(board, 3)
+                    agent.inplace = True
+                    actual, _ = getattr(agent, method)(board, 3)
+                    self.assertEqual(expected, actual)
+                    self.assertEqual(before, board.to_string())
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_replacement_policy(self):
+        """Depth-preferred slots keep deeper entries from the same search"""
+        for policy, kept in (("depth", 5), ("always", 2)):
+            table = transposition.TranspositionTable(8, policy)
+            table.store(3, 5, 1., transposition.EXACT, (0, 0))
+            table.store(11, 2, 2., transposition.EXACT, (1, 1))
+            self.assertIsNone(table.probe(3 if kept == 2 else 11))
+            self.assertEqual(kept, table.probe(11 if kept == 2 else 3).depth)
+            self.assertEqual({"hits": 1, "misses": 0, "collisions": 1},
+                             table.stats())
+
+        # entries from an earlier search are always replaced
+        table = transposition.TranspositionTable(8, "depth")
+        table.store(3, 5, 1., transposition.EXACT, (0, 0))
+        table.new_search()
+        table.store(11, 2, 2., transposition.EXACT, (1, 1))
+        self.assertEqual(2, table.probe(11).depth)
+
+    def test_alphabeta_with_table(self):
+        """Alpha-beta with a transposition table returns the same scores"""
+        random.seed(5)
+        collisions = 0
+        for num_moves in (2, 6, 10, 14):
+            agent = game_agent.CustomPlayer(4, improved_score, False,
+                                            "alphabeta", inplace=True)
+            agent.time_left = lambda: 1e3
+            board = random_position(isolation.BitBoard, agent, num_moves)
+            if board is None:
+                continue
+            expected, _ = agent.alphabeta(board, 4)
+            agent.tt = transposition.TranspositionTable(2 ** 12)
+            actual, move = agent.alphabeta(board, 4)
+            self.assertEqual(expected, actual)
+            self.assertIn(move, board.get_legal_moves())
+
+            # a table far smaller than the tree overflows but stays bounded
+            agent.tt = transposition.TranspositionTable(16)
+            actual, _ = agent.alphabeta(board, 4)
+            self.assertEqual(expected, actual)
+            collisions += agent.tt.collisions
+            self.assertEqual(16, len(agent.tt._table))
+            self.assertLessEqual(
+                sum(entry is not None for entry in agent.tt._table), 16)
+        # late positions can have fewer nodes than the table has slots
+        self.assertGreater(collisions, 0)
+
+
+def store_shared(table, key):
+    """Store an entry in a shared table from another process"""
+    table.store(key, 3, -2.5, transposition.LOWER, (4, 5))
+    table.close()
+
+
+def report_tracker(results):
+    """Report whether a child process has a resource tracker of its own"""
+    results.put(transposition._has_own_tracker())
+
+
+class SharedTranspositionTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tables = []
+
+    def tearDown(self):
+        for table in self.tables:
+            table.close()
+            table.unlink()
+
+    def new_table(self, *args):
+        table = transposition.SharedTranspositionTable(*args)
+        self.tables.append(table)
+        return table
+
+    def test_replacement_policy(self):
+        """The shared table follows the same replacement policies"""
+        for policy, kept in (("depth", 5), ("always", 2)):
+            table = self.new_table(8, policy)
+            table.store(3, 5, 1., transposition.EXACT, (0, 0))
+            table.store(11, 2, 2., transposition.EXACT, (1, 1))
+            self.assertIsNone(table.probe(3 if kept == 2 else 11))
+            self.assertEqual(kept, table.probe(11 if kept == 2 else 3).depth)
+            self.assertEqual({"hits": 1, "misses": 0, "collisions": 1},
+                             table.stats())
+
+        table = self.new_table(8, "depth")
+        table.store(3, 5, 1., transposition.EXACT, (0, 0))
+        table.new_search()
+        table.store(11, 2, 2., transposition.EXACT, (1, 1))
+        self.assertEqual(2, table.probe(11).depth)
+        table.clear()
+        self.assertIsNone(table.probe(11))
+
+    def test_shared_between_processes(self):
+        """Entries stored by another process can be probed, and torn slots
+        fail the key check"""
+        table = self.new_table(64)
+        key = 2 ** 64 - 5
+        worker = multiprocessing.Process(target=store_shared,
+                                         args=(table, key))
+        worker.start()
+        worker.join()
+        self.assertEqual(transposition.Entry(key, 3, -2.5, transposition.LOWER,
+                                             (4, 5), 0),
+                         table.probe(key))
+
+        # a slot half overwritten by another position is not a hit
+        offset = table._offset(key)
+        other = transposition.SharedTranspositionTable(64, name=table.name)
+        other.store(key + 64, 1, float("inf"), transposition.EXACT, (0, 0))
+        other.close()
+        table._shm.buf[offset + 16:offset + 24] = \
+            transposition.SCORE_BITS.pack(0)
+        self.assertIsNone(table.probe(key))
+        self.assertIsNone(table.probe(key + 64))
+        self.assertEqual(2, table.collisions)
+
+    def test_resource_tracker(self):
+        """Children started by multiprocessing share the tracker of their
+        parent, and an unrelated process that attaches does not free the
+        table when it exits"""
+        table = self.new_table(64)
+        self.assertIn(table.name, transposition._created_tables)
+        for method in ("fork", "spawn"):
+            context = multiprocessing.get_context(method)
+            results = context.Queue()
+            child = context.Process(target=report_tracker, args=(results,))
+            child.start()
+            self.assertFalse(results.get(timeout=30))
+            child.join()
+
+        script = ("import transposition; "
+                  "t = transposition.SharedTranspositionTable(64, name={!r}); "
+                  "t.store(7, 1, 0.5, transposition.EXACT, (0, 0)); "
+                  "t.close()").format(table.name)
+        subprocess.check_call([sys.executable, "-c", script],
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        attached = transposition.SharedTranspositionTable(64, name=table.name)
+        self.assertEqual(0.5, attached.probe(7).score)
+        attached.close()
+
+    def test_alphabeta_with_shared_table(self):
+        """Alpha-beta returns the same scores with a shared table"""
+        table = self.new_table(2 ** 12)
+        for num_moves in (2, 6, 10):
+            agent = game_agent.CustomPlayer(4, improved_score, False,
+                                            "alphabeta", inplace=True)
+            agent.time_left = lambda: 1e3
+            board = random_position(isolation.BitBoard, agent, num_moves)
+            if board is None:
+                continue
+            expected, _ = agent.alphabeta(board, 4)
+            agent.tt = table
+            table.new_search()
+            actual, move = agent.alphabeta(board, 4)
+            self.assertEqual(expected, actual)
+            self.assertIn(move, board.get_legal_moves())
+            # searching again is answered from the table
+            self.assertEqual((actual, move), agent.alphabeta(board, 4))
+            self.assertGreater(table.hits, 0)
+
+
+class MoveOrderingTest(unittest.TestCase):
+
+    def test_order_moves(self):
+        """The table move comes first, then killers, then history order"""
+        agent = game_agent.CustomPlayer(ordering=True)
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        moves = board.get_legal_moves(shuffle=False)
+        agent.history[True][moves[5]] = 10
+        agent.history[True][moves[6]] = 20
+        agent.killers[board.move_count] = [moves[3], moves[4]]
+        ordered = agent.order_moves(board, moves, True, moves[7])
+        self.assertEqual([moves[7], moves[3], moves[4], moves[6], moves[5]],
+                         ordered[:5])
+        self.assertEqual(sorted(moves), sorted(ordered))
+
+    def test_stock_board_signature(self):
+        """Without ordering, get_legal_moves() is called without `shuffle`"""
+
+        class StockBoard(isolation.Board):
+            def get_legal_moves(self, player=None):
+                return super(StockBoard, self).get_legal_moves(player)
+
+        agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta")
+        agent.time_left = lambda: 1e3
+        board = StockBoard(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        _, move = agent.alphabeta(board, 3)
+        self.assertIn(move, board.get_legal_moves())
+
+    def test_ordered_alphabeta_scores(self):
+        """Ordered alpha-beta returns the same scores as random order"""
+        for num_moves in (2, 6, 10, 14):
+            agent = game_agent.CustomPlayer(4, improved_score, False,
+                                            "alphabeta", inplace=True)
+            agent.time_left = lambda: 1e3
+            board = random_position(isolation.BitBoard, agent, num_moves)
+            if board is None:
+                continue
+            expected, _ = agent.alphabeta(board, 4)
+            agent.ordering = True
+            agent.tt = transposition.TranspositionTable(2 ** 12)
+            for depth in range(1, 5):
+                actual, _ = agent.alphabeta(board, depth)
+            self.assertEqual(expected, actual)
+
+
+class SymmetryTest(unittest.TestCase):
+
+    def test_symmetric_moves_pruned(self):
+        """Searching one move per symmetry class gives the same scores"""
+        agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta")
+        agent.time_left = lambda: 1e3
+        board = isolation.Board(agent, "opponent", 5, 5)
+        board.apply_move((2, 2))
+        moves = board.get_legal_moves()
+        self.assertEqual(5, len(agent.unique_moves(board, moves)))
+        for method in ("minimax", "alphabeta"):
+            agent.symmetry_plies = 0
+            expected, _ = getattr(agent, method)(board, 3, False)
+            agent.symmetry_plies = 3
+            actual, move = getattr(agent, method)(board, 3, False)
+            self.assertEqual(expected, actual)
+            self.assertIn(move, moves)
+
+
+class EndgameTest(unittest.TestCase):
+
+    def partitioned_position(self, agent):
+        """Return a 5x5 board after random play up to the first partitioned
+        position with `agent` to move, or None"""
+        board = isolation.Board("opponent", agent, 5, 5)
+        while board.get_legal_moves():
+            if board.is_partitioned() and board.active_player == agent:
+                return board
+            board.apply_move(random.choice(board.get_legal_moves()))
+        return None
+
+    def brute_force(self, board, square, visited):
+        """Return the longest knight path from `square` over open squares
+        not in `visited` by trying every path"""
+        best = 0
+        for dr, dc in isolation.geometry.DIRECTIONS:
+            move = (square[0] + dr, square[1] + dc)
+            if move not in visited and board.move_is_legal(move):
+                best = max(best, 1 + self.brute_force(
+                    board, move, visited | {move}))
+        return best
+
+    def test_solver_is_exact(self):
+        """The endgame solver finds the longest path, and get_move() plays
+        its first move once the board is partitioned"""
+        random.seed(13)
+        agent = game_agent.CustomPlayer(method="alphabeta", endgame=True)
+        solved = 0
+        while solved < 10:
+            board = self.partitioned_position(agent)
+            if board is None:
+                continue
+            solved += 1
+            expected = self.brute_force(
+                board, board.get_player_location(agent), set())
+            length, _ = endgame.solve_partitioned(board, agent, {})
+            self.assertEqual(expected, length)
+            move = agent.get_move(board, board.get_legal_moves(),
+                                  lambda: 1e3)
+            self.assertEqual(expected,
+                             1 + self.brute_force(board, move, {move}))
+
+
+class TablebaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "tablebase_4x4.bin")
+        tablebase.write_tablebase(self.path, 4, 4, 5)
+        self.table = tablebase.Tablebase(self.path)
+
+    def tearDown(self):
+        self.table.close()
+        shutil.rmtree(self.tmpdir)
+
+    def exact_value(self, board):
+        """Solve a position by searching the full game tree"""
+        values = [self.exact_value(board.forecast_move(move))
+                  for move in board.get_legal_moves()]
+        if not values:
+            return -1
+        if min(values) < 0:
+            return 1 - max(v for v in values if v < 0)
+        return -1 - max(values)
+
+    def test_probe_matches_search(self):
+        """Tablebase values and moves match a full game tree search"""
+        random.seed(14)
+        agent = game_agent.CustomPlayer(method="alphabeta",
+                                        tablebase=self.table)
+        for _ in range(50):
+            # apply_move() does not check legality, so any sequence of
+            # distinct squares sets up a position
+            squares = [(r, c) for r in range(4) for c in range(4)]
+            random.shuffle(squares)
+            board = isolation.Board(agent, "opponent", 4, 4)
+            for move in squares[:random.randint(11, 14)]:
+                board.apply_move(move)
+            expected = self.exact_value(board)
+            self.assertEqual(expected, self.table.probe(board))
+            if board.active_player != agent or not board.get_legal_moves():
+                continue
+            move = agent.get_move(board, board.get_legal_moves(),
+                                  lambda: 1e3)
+            child = self.exact_value(board.forecast_move(move))
+            self.assertEqual(expected, 1 - child if child < 0 else -1 - child)
+
+    def test_uncovered_positions(self):
+        """States with too many open squares are not in the table"""
+        board = isolation.Board("p1", "p2", 4, 4)
+        board.apply_move((0, 0))
+        board.apply_move((1, 1))
+        self.assertIsNone(self.table.probe(board))
+        self.assertIsNone(self.table.best_move(board))
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "book_5x5.bin")
+        self.size = opening_book.write_book(self.path, 5, 5, 2, 2)
+        self.book = opening_book.OpeningBook(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_book_covers_symmetric_positions(self):
+        """Book moves of symmetric positions are symmetric, and get_move()
+        plays the book move"""
+        # the empty board and one reply per first move up to symmetry
+        self.assertEqual(1 + 6, self.size)
+        self.assertEqual(self.size, len(self.book))
+        agent = game_agent.CustomPlayer(opening_book=self.book)
+        board = isolation.Board(agent, "opponent", 5, 5)
+        self.assertEqual(self.book.lookup(board),
+                         agent.get_move(board, board.get_legal_moves(),
+                                        lambda: 1e3))
+        first = (0, 1)
+        reply = self.book.lookup(board.forecast_move(first))
+        self.assertIn(reply, board.forecast_move(first).get_legal_moves())
+        for transform in range(8):
+            image = board.forecast_move(board.transform_move(first, transform))
+            self.assertEqual(board.transform_move(reply, transform),
+                             self.book.lookup(image))
+        board.apply_move((0, 0))
+        board.apply_move((4, 4))
+        self.assertIsNone(self.book.lookup(board))
+
+
+class ParallelSearchTest(unittest.TestCase):
+
+    def test_replay_moves(self):
+        """replay_moves() recreates the position on an empty board"""
+        for backend in (isolation.Board, isolation.BitBoard):
+            for num_moves in range(6):
+                board = random_position(backend, "p1", num_moves)
+                if board is None:
+                    continue
+                replayed = backend("p1", "opponent")
+                for move in game_agent.replay_moves(board):
+                    replayed.apply_move(move)
+                self.assertEqual(board.to_string(), replayed.to_string())
+                self.assertEqual(board.move_count, replayed.move_count)
+                self.assertEqual(board.zobrist, replayed.zobrist)
+
+    def test_worker_scores(self):
+        """A worker task returns the score of a serial root move search"""
+        agent = game_agent.CustomPlayer(3, improved_score, True, "alphabeta",
+                                        workers=2, tt_size=2 ** 10)
+        game_agent._init_worker(agent.worker_settings())
+        for num_moves in (2, 4, 6, 8):
+            board = random_position(isolation.BitBoard, agent, num_moves)
+            if board is None:
+                continue
+            agent.time_left = lambda: 1e3
+            deadline = 1000 * game_agent.time.monotonic() + 1e4
+            move = board.get_legal_moves()[0]
+            expected = agent.search_child(board, move, agent.alphabeta, 2,
+                                          float("-inf"), float("inf"), False)
+            task = (isolation.BitBoard, 7, 7, board.move_count % 2,
+                    game_agent.replay_moves(board), move, 3, float("-inf"),
+                    deadline)
+            self.assertEqual((expected, move),
+                             game_agent._search_root_move(task))
+            # a window below the score of the move still returns the score,
+            # and a window above it returns no more than its lower bound
+            below = task[:7] + (expected - 1,) + task[8:]
+            self.assertEqual((expected, move),
+                             game_agent._search_root_move(below))
+            above = task[:7] + (expected + 1,) + task[8:]
+            score, _ = game_agent._search_root_move(above)
+            self.assertLessEqual(score, expected + 1)
+            expired = task[:-1] + (deadline - 1e5,)
+            self.assertIsNone(game_agent._search_root_move(expired))
+
+    def test_parallel_get_move(self):
+        """Parallel search returns a legal move before the deadline"""
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta", workers=2)
+        try:
+            board = isolation.Board(agent, "opponent")
+            board.apply_move((3, 3))
+            board.apply_move((2, 4))
+            for _ in range(2):
+                start = game_agent.time.monotonic()
+                time_left = lambda: 150 - 1000 * (game_agent.time.monotonic() - start)
+                move = agent.get_move(board, board.get_legal_moves(), time_left)
+                self.assertGreater(time_left(), 0)
+                self.assertIn(move, board.get_legal_moves())
+        finally:
+            agent.close()
+        self.assertIsNone(agent.pool)
+
+
+class PonderTest(unittest.TestCase):
+
+    def turn_clock(self, limit=150):
+        start = game_agent.time.monotonic()
+        return lambda: limit - 1000 * (game_agent.time.monotonic() - start)
+
+    def test_predict_reply(self):
+        """The predicted reply is the table move, else the reply with the
+        lowest heuristic score"""
+        agent = game_agent.CustomPlayer(score_fn=improved_score)
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((2, 4))
+        move = board.get_legal_moves()[0]
+        child = board.forecast_move(move)
+        replies = child.get_legal_moves()
+        self.assertEqual(min(improved_score(child.forecast_move(r), agent)
+                             for r in replies),
+                         improved_score(child.forecast_move(
+                             agent.predict_reply(board, move)), agent))
+        agent.tt = transposition.TranspositionTable(64)
+        agent.tt.store(child.zobrist ^ transposition.PERSPECTIVE_KEY, 1, 0.,
+                       transposition.EXACT, replies[-1])
+        self.assertEqual(replies[-1], agent.predict_reply(board, move))
+
+    def test_ponder_hit_and_miss(self):
+        """A ponder hit plays the background search's move, and a miss
+        searches the actual position"""
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta", ponder=True)
+        try:
+            board = isolation.Board(agent, "opponent")
+            board.apply_move((3, 3))
+            board.apply_move((2, 4))
+            time_left = self.turn_clock()
+            move = agent.get_move(board, board.get_legal_moves(), time_left)
+            self.assertGreater(time_left(), 0)
+            self.assertIsNotNone(agent.ponder_job)
+            reply = agent.predict_reply(board, move)
+            board.apply_move(move)
+            board.apply_move(reply)
+            self.assertEqual(agent.ponder_key, board.zobrist)
+            time_left = self.turn_clock()
+            move = agent.get_move(board, board.get_legal_moves(), time_left)
+            self.assertGreater(time_left(), 0)
+            self.assertIn(move, board.get_legal_moves())
+            self.assertEqual((1, 0), (agent.ponder_hits, agent.ponder_misses))
+
+            board.apply_move(move)
+            board.apply_move([reply for reply in board.get_legal_moves()
+                              if board.forecast_move(reply).zobrist !=
+                              agent.ponder_key][0])
+            move = agent.get_move(board, board.get_legal_moves(),
+                                  self.turn_clock())
+            self.assertIn(move, board.get_legal_moves())
+            self.assertEqual((1, 1), (agent.ponder_hits, agent.ponder_misses))
+        finally:
+            agent.close()
+        self.assertIsNone(agent.ponder_pool)
+
+
+class ReuseSearchTest(unittest.TestCase):
+
+    def test_resume_from_previous_move(self):
+        """The next get_move() starts two plies below the last completed
+        iteration and searches the predicted principal variation move first"""
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta", tt_size=2 ** 12,
+                                        reuse_search=True)
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((2, 4))
+        start = game_agent.time.monotonic()
+        move = agent.get_move(board, board.get_legal_moves(),
+                              lambda: 200 - 1000 * (game_agent.time.monotonic() - start))
+        self.assertGreaterEqual(agent.last_depth, 3)
+        self.assertEqual(move, agent.pv[0])
+        self.assertGreaterEqual(len(agent.pv), 3)
+        last_depth, pv = agent.last_depth, agent.pv
+        for pv_move in pv[:2]:
+            self.assertIn(pv_move, board.get_legal_moves())
+            board.apply_move(pv_move)
+        self.assertEqual(agent.pv_key, board.zobrist)
+
+        searched = []
+
+        def search_root(game, depth, root_moves, *args):
+            searched.append((depth, root_moves[0]))
+            raise game_agent.Timeout()
+
+        agent.search_root = search_root
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        self.assertEqual([(last_depth - 2, pv[2])], searched)
+        self.assertEqual(0, agent.last_depth)
+
+        # a new game starts from depth 1
+        searched.clear()
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((2, 4))
+        agent.last_depth = last_depth
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        self.assertEqual(1, searched[0][0])
+
+
+class SearchStatsTest(unittest.TestCase):
+
+    def test_node_counts(self):
+        """Fixed-depth minimax counts every position and leaf of the tree"""
+        agent = game_agent.CustomPlayer(2, improved_score, False)
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((2, 4))
+        children = [board.forecast_move(move) for move in board.get_legal_moves()]
+        leaves = sum(len(child.get_legal_moves()) or 1 for child in children)
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        stats = agent.stats.as_dict()
+        self.assertEqual(1 + len(children) + leaves, stats["nodes"])
+        self.assertEqual(leaves, stats["leaves"])
+        self.assertEqual(0, stats["cutoffs"])
+        self.assertEqual(2, stats["depth"])
+        self.assertEqual([2], [it["depth"] for it in stats["iterations"]])
+
+    def test_stats_log(self):
+        """get_move() appends one JSON line of statistics per move"""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, "stats.jsonl")
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta", ordering=True,
+                                        stats_log=path)
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((2, 4))
+        for _ in range(2):
+            start = game_agent.time.monotonic()
+            move = agent.get_move(board, board.get_legal_moves(),
+                                  lambda: 100 - 1000 * (game_agent.time.monotonic() - start))
+            board.apply_move(move)
+            board.apply_move(board.get_legal_moves()[0])
+        with open(path) as log:
+            lines = [json.loads(line) for line in log]
+        self.assertEqual(2, len(lines))
+        self.assertEqual(agent.stats.as_dict()["nodes"], lines[-1]["nodes"])
+        for stats in lines:
+            depths = [it["depth"] for it in stats["iterations"]]
+            self.assertEqual(list(range(1, len(depths) + 1)), depths)
+            self.assertEqual(depths[-1], stats["depth"])
+            self.assertGreater(stats["nps"], 0)
+            self.assertGreater(stats["ebf"], 1)
+            self.assertGreater(stats["cutoffs"], 0)
+            self.assertTrue(0 <= stats["first_move_cutoff_rate"] <= 1)
+            self.assertLessEqual(sum(it["time"] for it in stats["iterations"]),
+                                 stats["time"])
+
+
+class PartialIterationTest(unittest.TestCase):
+
+    def test_partial_iteration_result(self):
+        """get_move() uses root moves completed before a Timeout"""
+        agent = game_agent.CustomPlayer(method="alphabeta")
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        legal_moves = board.get_legal_moves()
+        first, second = legal_moves[-1], legal_moves[0]
+        searched = []
+
+        def search_child(game, move, search, depth, *args):
+            searched.append((depth, move))
+            if depth < 2:
+                return 1. if move == first else 0.
+            if len(searched) > 2 * len(legal_moves) + 2:
+                raise game_agent.Timeout()
+            return 2. if move == second else -1.
+
+        agent.search_child = search_child
+        move = agent.get_move(board, legal_moves, lambda: 1e3)
+        self.assertEqual(second, move)
+        # the best move from depth 1 is searched first at each depth
+        self.assertEqual((1, first), searched[len(legal_moves)])
+        self.assertEqual((2, first), searched[2 * len(legal_moves)])
+
+
+class WindowedSearchTest(unittest.TestCase):
+
+    def test_pvs_scores(self):
+        """Principal variation search returns the alpha-beta scores"""
+        for num_moves in (2, 6, 10, 14):
+            agent = game_agent.CustomPlayer(4, game_agent.custom_score_2,
+                                            False, "alphabeta", inplace=True)
+            agent.time_left = lambda: 1e3
+            board = random_position(isolation.BitBoard, agent, num_moves)
+            if board is None:
+                continue
+            expected, _ = agent.alphabeta(board, 4)
+            agent.method = "pvs"
+            actual, _ = agent.alphabeta(board, 4)
+            self.assertEqual(expected, actual)
+            actual, _ = agent.search_root(board, 4, board.get_legal_moves(), [])
+            self.assertEqual(expected, actual)
+
+    def test_aspiration_windows(self):
+        """Root searches report exact scores inside the window and bounds
+        outside of it
+        """
+        agent = game_agent.CustomPlayer(3, improved_score, False,
+                                        "aspiration", inplace=True)
+        agent.time_left = lambda: 1e3
+        random.seed(6)
+        board = random_position(isolation.BitBoard, agent, 6)
+        if board is None:
+            self.skipTest("the random opening ended the game")
+        moves = board.get_legal_moves()
+        expected, _ = agent.search_root(board, 3, moves, [])
+        actual, _ = agent.search_root(board, 3, moves, [],
+                                      expected - 1, expected + 1)
+        self.assertEqual(expected, actual)
+        low, _ = agent.search_root(board, 3, moves, [],
+                                   expected + 1, expected + 3)
+        self.assertLessEqual(low, expected + 1)
+        high, _ = agent.search_root(board, 3, moves, [],
+                                    expected - 3, expected - 1)
+        self.assertGreaterEqual(high, expected - 1)
+        move = agent.get_move(board, moves, lambda: 50)
+        self.assertIn(move, moves)
+
+    def test_timeout_during_aspiration_research(self):
+        """A Timeout in an aspiration re-search returns the last completed
+        iteration's best move, not the best bound of the failed search
+        """
+        agent = game_agent.CustomPlayer(method="aspiration")
+        board = isolation.Board(agent, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        legal_moves = board.get_legal_moves()
+        first, other = legal_moves[-1], legal_moves[0]
+
+        def search_child(game, move, search, depth, alpha, beta, *args):
+            if depth == 0:
+                return 1. if move == first else 0.
+            if alpha == float("-inf"):
+                raise game_agent.Timeout()  # the re-search after failing low
+            return -2. if move == other else -5.
+
+        agent.search_child = search_child
+        move = agent.get_move(board, legal_moves, lambda: 1e3)
+        self.assertEqual(first, move)
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def test_amortized_clock_reads(self):
+        """The clock is read rarely but the threshold is still honored"""
+        agent = game_agent.CustomPlayer(check_interval=1000, timeout=10.)
+        nodes = [0]
+        reads = [0]
+
+        def time_left():
+            reads[0] += 1
+            return 100. - 0.001 * nodes[0]  # each node takes 1 microsecond
+
+        agent.time_left = time_left
+        with self.assertRaises(game_agent.Timeout):
+            while True:
+                nodes[0] += 1
+                agent.check_time()
+        self.assertLess(reads[0], nodes[0] / 50)
+        self.assertLessEqual(time_left(), agent.TIMER_THRESHOLD)
+        self.assertGreater(time_left(), agent.TIMER_THRESHOLD - 0.01)
+
+    def test_default_reads_every_node(self):
+        """With check_interval=1 the clock is read at every node"""
+        agent = game_agent.CustomPlayer()
+        reads = []
+        agent.time_left = lambda: reads.append(1) or 100.
+        for _ in range(10):
+            agent.check_time()
+        self.assertEqual(10, len(reads))
+
+
+class EvalCacheTest(unittest.TestCase):
+
+    def test_cached_scores(self):
+        """Cached scores match the heuristic for both players"""
+        calls = []
+
+        def score_fn(game, player):
+            calls.append(player)
+            return improved_score(game, player)
+
+        cache = transposition.EvalCache(score_fn, size=2)
+        board = isolation.Board("p1", "p2")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        for _ in range(2):
+            for player in ("p1", "p2"):
+                self.assertEqual(improved_score(board, player),
+                                 cache(board, player))
+        self.assertEqual(["p1", "p2"], calls)
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(0.5, cache.stats()["hit_rate"])
+
+        # the least recently used score is evicted first
+        cache(board, "p1")
+        cache(board.forecast_move((1, 1)), "p1")
+        cache(board, "p1")
+        self.assertEqual(["p1", "p2", "p1"], calls)
+        cache(board, "p2")
+        self.assertEqual(["p1", "p2", "p1", "p2"], calls)
+
+    def test_stats_reset_per_game(self):
+        """CustomPlayer resets the cache counters when a new game starts"""
+        agent = game_agent.CustomPlayer(2, improved_score, False, "minimax",
+                                        eval_cache_size=1000)
+
+        def new_board():
+            board = isolation.Board(agent, "opponent")
+            board.apply_move((3, 3))
+            board.apply_move((0, 0))
+            return board
+
+        board = new_board()
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        first_search = agent.score.stats()
+        self.assertGreater(first_search["misses"], 0)
+        lookups = first_search["hits"] + first_search["misses"]
+
+        # counters accumulate over the moves of one game
+        board.apply_move(board.get_legal_moves()[0])
+        board.apply_move(board.get_legal_moves()[0])
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        stats = agent.score.stats()
+        self.assertGreater(stats["hits"] + stats["misses"], lookups)
+
+        agent.new_game()
+        self.assertEqual(0, agent.score.hits)
+        self.assertEqual(0, agent.score.misses)
+
+        # a lower move count starts a new game; the cached scores are kept
+        board = new_board()
+        agent.score.hits = agent.score.misses = 1
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        self.assertEqual(lookups, agent.score.hits)
+        self.assertEqual(0, agent.score.misses)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""This file contains a sequential probability ratio test (SPRT) for
+comparing two agents: games are added until the results are strong enough
+to accept one of two hypotheses about the Elo difference between the
+agents, so that clear-cut comparisons stop early and close ones get as many
+games as they need.
+
+`tournament.play_match()` plays its two games from the same opening with
+the seats swapped, so the results of a pair are correlated and the games
+are not independent trials. The test therefore treats each pair as one
+sample with a score of 0, 1 or 2 wins (a trinomial model) and uses the
+generalized SPRT of Van den Bergh: the log-likelihood ratio is
+approximated from the mean and variance of the pair scores. The error
+rates alpha and beta hold approximately, the more closely the more pairs
+are played.
+"""
+import math
+
+
+def elo_to_score(elo):
+    """Return the expected score of an agent rated `elo` points above its
+    opponent.
+    """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """Return the Elo difference that gives an expected score of `score`."""
+    score = min(max(score, 1e-6), 1. - 1e-6)
+    return -400. * math.log10(1. / score - 1.)
+
+
+class SPRT(object):
+    """Test H0: the candidate is `elo0` points stronger than the baseline,
+    against H1: the candidate is `elo1` points stronger.
+
+    Parameters
+    ----------
+    elo0, elo1 : float (optional)
+        The Elo differences of the two hypotheses; elo0 < elo1.
+
+    alpha : float (optional)
+        The probability of accepting H1 when H0 is true.
+
+    beta : float (optional)
+        The probability of accepting H0 when H1 is true.
+    """
+
+    # pseudo-pairs added to each pair score when estimating the variance of
+    # the scores, so that a few identical pairs do not look certain
+    PRIOR_PAIRS = 0.5
+
+    def __init__(self, elo0=0., elo1=20., alpha=0.05, beta=0.05):
+        if not elo0 < elo1:
+            raise ValueError("elo0 must be less than elo1")
+        self.elo0, self.elo1 = elo0, elo1
+        self.alpha, self.beta = alpha, beta
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        self.pairs = [0, 0, 0]  # the number of pairs won 0, 1 and 2 times
+
+    def add_pair(self, wins):
+        """Add a pair of games in which the candidate won `wins` times."""
+        self.pairs[wins] += 1
+
+    @property
+    def wins(self):
+        return self.pairs[1] + 2 * self.pairs[2]
+
+    @property
+    def losses(self):
+        return self.pairs[1] + 2 * self.pairs[0]
+
+    @property
+    def games(self):
+        return 2 * sum(self.pairs)
+
+    @property
+    def llr(self):
+        """The approximate log-likelihood ratio of H1 to H0 of the pairs so
+        far.
+        """
+        num_pairs = sum(self.pairs)
+        if not num_pairs:
+            return 0.
+        counts = [count + self.PRIOR_PAIRS for count in self.pairs]
+        total = sum(counts)
+        # the mean and variance of the score of a pair, as a fraction of 1
+        mean = sum(count * wins / 2. for wins, count in enumerate(counts))
+        mean /= total
+        variance = sum(count * (wins / 2. - mean) ** 2
+                       for wins, count in enumerate(counts)) / total
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return num_pairs * (s1 - s0) * (2. * mean - s0 - s1) / (2. * variance)
+
+    def status(self):
+        """Return "H1" or "H0" once a hypothesis is accepted, else None."""
+        llr = self.llr
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def __str__(self):
+        elo = score_to_elo(self.wins / self.games) if self.games else 0.
+        return ("Games: {} (+{} -{}) Pairs: {}/{}/{}  Elo: {:+.1f}  "
+                "LLR: {:.2f} [{:.2f}, {:.2f}]".format(
+                    self.games, self.wins, self.losses, *self.pairs, elo,
+                    self.llr, self.lower, self.upper))
@@ -0,0 +1,243 @@
+"""This file contains an endgame tablebase for small Isolation boards: a
+generator that solves every late-game state exactly and writes the results
+to a compact binary file, and a reader that looks states up through `mmap`
+so that any number of processes can share one file through the page cache.
+
+The value of a state only depends on the set of open squares and on the
+open squares each player can move to next, not on where the players stand
+or on which squares were blocked first, so the table is keyed by these
+three masks. For example, to solve all 5x5 states with at most 5 open
+squares:
+
+    python tablebase.py 5 5 5 tablebase_5x5.bin
+"""
+import argparse
+import itertools
+import mmap
+import struct
+
+from isolation.geometry import get_geometry
+
+MAGIC = b"ISOTB1"
+
+# magic, width, height, max_empty, number of records
+HEADER = struct.Struct("<6sBBBI")
+
+
+def key_size(num_squares):
+    """Return the number of bytes in the key of a board with the given
+    number of squares.
+    """
+    return (3 * num_squares + 7) // 8
+
+
+def encode_key(num_squares, empty, own, opp):
+    """Pack the open squares, the moves of the player to move and the moves
+    of the opponent into a key that sorts in the same order as the masks.
+    """
+    key = (empty << 2 * num_squares) | (own << num_squares) | opp
+    return key.to_bytes(key_size(num_squares), "big")
+
+
+def solve_state(neighbor_masks, empty, own, opp, memo):
+    """Return the value of a state for the player to move.
+
+    A value of +n means the player to move wins and -n means it loses, with
+    the game lasting n - 1 more moves when the winner finishes as quickly as
+    possible and the loser holds out as long as possible.
+
+    Parameters
+    ----------
+    neighbor_masks : list<int>
+        The knight-move mask of each square (`Geometry.neighbor_masks`).
+
+    empty : int
+        The mask of open squares.
+
+    own : int
+        The mask of open squares the player to move can move to.
+
+    opp : int
+        The mask of open squares the opponent can move to.
+
+    memo : dict
+        Values already computed, keyed by (empty, own, opp).
+    """
+    if not own:
+        return -1
+    key = (empty, own, opp)
+    value = memo.get(key)
+    if value is not None:
+        return value
+    best = None
+    moves = own
+    while moves:
+        low = moves & -moves
+        moves ^= low
+        rest = empty ^ low
+        child = solve_state(neighbor_masks, rest, opp & ~low,
+                            neighbor_masks[low.bit_length() - 1] & rest, memo)
+        # win as fast as possible, or lose as slowly as possible
+        if child < 0:
+            value = 1 - child
+            if best is None or best < 0 or value < best:
+                best = value
+        elif best is None or (best < 0 and -1 - child < best):
+            best = -1 - child
+    memo[key] = best
+    return best
+
+
+def generate(width, height, max_empty):
+    """Return the sorted (key, value) records of every state with at most
+    `max_empty` open squares in which the player to move has a legal move
+    and both players have moved.
+    """
+    geometry = get_geometry(width, height)
+    num_squares = width * height
+    neighbor_masks = geometry.neighbor_masks
+    memo = {}
+    records = []
+    for num_empty in range(max_empty + 1):
+        for squares in itertools.combinations(range(num_squares), num_empty):
+            empty = sum(1 << idx for idx in squares)
+            options = {neighbor_masks[idx] & empty
+                       for idx in range(num_squares) if not empty >> idx & 1}
+            for own in options:
+                if not own:
+                    continue
+                for opp in options:
+                    value = solve_state(neighbor_masks, empty, own, opp, memo)
+                    records.append(
+                        (encode_key(num_squares, empty, own, opp), value))
+    records.sort()
+    return records
+
+
+def write_tablebase(path, width, height, max_empty):
+    """Solve all states with at most `max_empty` open squares and write
+    them to `path`; returns the number of records written.
+    """
+    records = generate(width, height, max_empty)
+    record = struct.Struct("{}sb".format(key_size(width * height)))
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, max_empty, len(records)))
+        for key, value in records:
+            f.write(record.pack(key, value))
+    return len(records)
+
+
+class Tablebase(object):
+    """Look up exact endgame values in a file written by
+    `write_tablebase()`, without reading the whole file into memory.
+
+    Parameters
+    ----------
+    path : str
+        The path of the tablebase file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self.max_empty, self.size = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("Not a tablebase file: {}".format(path))
+        self.key_size = key_size(self.width * self.height)
+        self.record_size = self.key_size + 1
+
+    def __getstate__(self):
+        # reopen the file instead of copying it, e.g., in worker processes
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        self._map.close()
+        self._file.close()
+
+    def covers(self, game):
+        """Test whether the game state is small enough to be in the table."""
+        return (game.width == self.width and game.height == self.height and
+                len(game.get_blank_spaces()) <= self.max_empty)
+
+    def probe(self, game):
+        """Return the value of the game state for the player to move.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The current game state.
+
+        Returns
+        ----------
+        int or None
+            The value as defined by `solve_state()`, or None if the state
+            is not in the table.
+        """
+        if not self.covers(game):
+            return None
+        own = self._moves_mask(game, game.active_player)
+        if not own:
+            return -1
+        key = encode_key(self.width * self.height,
+                         self._squares_mask(game, game.get_blank_spaces()),
+                         own, self._moves_mask(game, game.inactive_player))
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * self.record_size
+            stored = self._map[offset:offset + self.key_size]
+            if stored == key:
+                return struct.unpack_from("b", self._map,
+                                          offset + self.key_size)[0]
+            if stored < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def best_move(self, game):
+        """Return the move that wins fastest (or loses slowest) according to
+        the table, or None if the state is not in the table.
+        """
+        best_value, best_move = None, None
+        for move in game.get_legal_moves(shuffle=False):
+            value = self.probe(game.forecast_move(move))
+            if value is None:
+                return None
+            value = -value
+            if (best_value is None or
+                    (value > 0 and (best_value < 0 or value < best_value)) or
+                    (value < 0 and best_value < 0 and value < best_value)):
+                best_value, best_move = value, move
+        return best_move
+
+    def _squares_mask(self, game, squares):
+        return sum(1 << (r + c * game.height) for r, c in squares)
+
+    def _moves_mask(self, game, player):
+        return self._squares_mask(game, game.get_legal_moves(player))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate an Isolation endgame tablebase.")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("max_empty", type=int,
+                        help="the largest number of open squares to solve")
+    parser.add_argument("path", help="the output file")
+    args = parser.parse_args()
+    count = write_tablebase(args.path, args.width, args.height,
+                            args.max_empty)
+    print("Wrote {} states to {}".format(count, args.path))
+
+
+if __name__ == "__main__":
+    main()
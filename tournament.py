@@ -17,15 +17,38 @@ For example, if the random moves chosen for initialization are (5, 2) and
 agentB at (1, 3) as player 2 then play to conclusion; the agents swap
 initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 (1, 3) as player 2.
+
+To spread the matches over several machines, start a coordinator and any
+number of workers (which need the same code, including game_agent.py):
+
+    python tournament.py --serve 0.0.0.0:6000 --authkey SECRET
+    python tournament.py --connect coordinator-host:6000 --authkey SECRET
+
+Coordinator and workers exchange pickles, so anyone who knows the authkey
+can run code on either side: choose a secret authkey (one is required for
+any address but localhost) and only serve on a trusted network.
 """
 
+import argparse
+import collections
 import itertools
+import multiprocessing
+import os
 import random
 import warnings
 
 from collections import namedtuple
 
-from isolation import Board
+from game_log import GameLog
+from game_log import read_records
+from game_log import summarize
+from isolation import BitBoard
+from job_queue import Coordinator
+from job_queue import check_authkey
+from job_queue import parse_address
+from job_queue import run_worker
+from ratings import Ratings
+from sprt import SPRT
 from sample_players import RandomPlayer
 from sample_players import null_score
 from sample_players import open_move_score
@@ -35,6 +58,10 @@ from game_agent import custom_score
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+BOARD_BACKEND = BitBoard  # isolation.Board or isolation.BitBoard
+NUM_WORKERS = 1  # number of processes playing matches (1 plays them in turn)
+PIN_CPUS = True  # pin each worker process to its own CPU
+SPRT_MAX_MATCHES = 1000  # matches before an SPRT gives up without a decision
 
 TIMEOUT_WARNING = "One or more agents lost a match this round due to " + \
                   "timeout. The get_move() function must return before " + \
@@ -57,27 +84,57 @@ same opponents.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_match(player1, player2):
+def play_match(player1, player2, seed=None):
     """
     Play a "fair" set of matches between two agents by playing two games
     between the players, forcing each agent to play from randomly selected
     positions. This should control for differences in outcome resulting from
     advantage due to starting position on the board.
+
+    If `seed` is given, the random number generator is seeded with it for
+    the match, so that the match does not depend on the process that plays
+    it, and its previous state is restored afterwards, so that the match
+    does not change the random numbers drawn by the caller.
+
+    Returns the number of games won by each player and a dict describing
+    each game: the indices of its first and second player in (player1,
+    player2), the opening moves, the moves played, the index of the
+    winner, the termination reason and the time taken for each move.
     """
+    if seed is None:
+        return _play_match(player1, player2)
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        return _play_match(player1, player2)
+    finally:
+        random.setstate(state)
+
+
+def _play_match(player1, player2):
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
-    games = [Board(player1, player2), Board(player2, player1)]
+    games = [BOARD_BACKEND(player1, player2), BOARD_BACKEND(player2, player1)]
+    opening = []
 
     # initialize both games with a random move and response
     for _ in range(2):
         move = random.choice(games[0].get_legal_moves())
         games[0].apply_move(move)
         games[1].apply_move(move)
+        opening.append(list(move))
 
     # play both games and tally the results
-    for game in games:
-        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    records = []
+    for game, seats in zip(games, ([0, 1], [1, 0])):
+        move_times = []
+        winner, move_history, termination = game.play(
+            time_limit=TIME_LIMIT, move_times=move_times)
+        records.append({"players": seats, "opening": opening,
+                        "moves": move_history,
+                        "winner": 0 if winner == player1 else 1,
+                        "termination": termination, "times": move_times})
 
         if player1 == winner:
             num_wins[player1] += 1
@@ -99,50 +156,344 @@ def play_match(player1, player2):
     if sum(num_timeouts.values()) != 0:
         warnings.warn(TIMEOUT_WARNING)
 
-    return num_wins[player1], num_wins[player2]
+    return num_wins[player1], num_wins[player2], records
 
 
-def play_round(agents, num_matches):
+def game_records(round_name, agent, match, seed, agents, games):
+    """Label the games returned by play_match() with the round, the name of
+    the agent under test, the match, the seed and the agent names, as stored
+    in a game_log.GameLog.
+    """
+    names = [a.name for a in agents]
+    return [dict(game, round=round_name, agent=agent, match=match, game=idx,
+                 seed=seed, players=[names[seat] for seat in game["players"]],
+                 winner=names[game["winner"]])
+            for idx, game in enumerate(games)]
+
+
+def _pin_worker(counter, cpus):
+    """Pin a tournament worker process to the next CPU in `cpus`."""
+    with counter.get_lock():
+        idx = counter.value
+        counter.value += 1
+    os.sched_setaffinity(0, {cpus[idx % len(cpus)]})
+
+
+def make_pool(num_workers, pin_cpus=True):
+    """
+    Start a pool of processes for play_round(). With `pin_cpus`, each worker
+    is pinned to its own CPU (where the platform supports it), so that
+    workers do not compete for cores and wall-clock time limits stay fair.
+    """
+    initializer, initargs = None, ()
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        initializer = _pin_worker
+        initargs = (multiprocessing.Value("i", 0), cpus)
+    return multiprocessing.Pool(num_workers, initializer, initargs)
+
+
+def play_round(agents, num_matches, pool=None, log=None):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    With a process `pool` (see make_pool()) or a job_queue.Coordinator, all
+    matches of the round are played in parallel; the results are tallied in
+    the same order either way.
+
+    With a game_log.GameLog, the games of each match are logged as soon as
+    the match is collected, and matches the log already holds are not
+    played again.
     """
     agent_1 = agents[-1]
     wins = 0.
     total = 0.
 
+    # Each player takes a turn going first; every match gets its own seed,
+    # so the round plays the same matches with or without a pool
+    schedule = []
+    match = 0
+    for agent_2 in agents[:-1]:
+        matches = []
+        for seats in itertools.permutations((agent_1, agent_2)):
+            for _ in range(num_matches):
+                seed = random.getrandbits(32)
+                logged, pending = None, None
+                if log is not None:
+                    logged = log.completed(agent_1.name, match)
+                if logged is None and pool is not None:
+                    pending = pool.apply_async(
+                        play_match, (seats[0].player, seats[1].player, seed))
+                matches.append((match, seed, seats, logged, pending))
+                match += 1
+        schedule.append(matches)
+
     print("\nPlaying Matches:")
     print("----------")
 
-    for idx, agent_2 in enumerate(agents[:-1]):
+    for idx, (agent_2, matches) in enumerate(zip(agents[:-1], schedule)):
 
-        counts = {agent_1.player: 0., agent_2.player: 0.}
+        counts = {agent_1.name: 0., agent_2.name: 0.}
         names = [agent_1.name, agent_2.name]
         print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
 
-        # Each player takes a turn going first
-        for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
-                counts[p1] += score_1
-                counts[p2] += score_2
-                total += score_1 + score_2
+        for match, seed, seats, records, pending in matches:
+            if records is None:
+                if pending is not None:
+                    _, _, games = pending.get()
+                else:
+                    _, _, games = play_match(seats[0].player,
+                                             seats[1].player, seed)
+                records = game_records(agent_1.name, agent_1.name, match,
+                                       seed, seats, games)
+                if log is not None:
+                    log.append(records)
+            for record in records:
+                counts[record["winner"]] += 1
+                total += 1
+
+        wins += counts[agent_1.name]
+
+        print("\tResult: {} to {}".format(int(counts[agent_1.name]),
+                                          int(counts[agent_2.name])))
 
-        wins += counts[agent_1.player]
+    return 100. * wins / total
 
-        print("\tResult: {} to {}".format(int(counts[agent_1.player]),
-                                          int(counts[agent_2.player])))
 
-    return 100. * wins / total
+def play_sprt(candidate, baseline, test, max_matches=SPRT_MAX_MATCHES,
+              pool=None, log=None, batch_size=1):
+    """
+    Play matches between a candidate and a baseline agent until the
+    sequential probability ratio test `test` (a sprt.SPRT) accepts one of
+    its hypotheses or `max_matches` matches have been played. Each match is
+    a pair of games with the seats swapped, as in play_round().
+
+    With a process `pool` or a job_queue.Coordinator, up to `batch_size`
+    matches are played ahead; results are still added to the test in the
+    order the matches were scheduled, so the outcome does not depend on the
+    number of workers. With a game_log.GameLog, matches are logged and
+    resumed as in play_round().
+
+    Returns "H1", "H0", or None if no hypothesis was accepted
+    """
+    round_name = "SPRT: {} vs {}".format(candidate.name, baseline.name)
+    seats = (candidate, baseline)
+    # draw the seeds of the matches from a generator of their own, so that
+    # the agents cannot change them
+    seeds = random.Random(random.getrandbits(32))
+    scheduled = collections.deque()
+    match = 0
+
+    print("\n{}".format(round_name))
+    print("----------")
+
+    while test.status() is None and (match < max_matches or scheduled):
+        while match < max_matches and len(scheduled) < max(batch_size, 1):
+            seed = seeds.getrandbits(32)
+            logged, pending = None, None
+            if log is not None:
+                logged = log.completed(round_name, match)
+            if logged is None and pool is not None:
+                pending = pool.apply_async(
+                    play_match, (candidate.player, baseline.player, seed))
+            scheduled.append((match, seed, logged, pending))
+            match += 1
+
+        idx, seed, records, pending = scheduled.popleft()
+        if records is None:
+            if pending is not None:
+                _, _, games = pending.get()
+            else:
+                _, _, games = play_match(candidate.player, baseline.player,
+                                         seed)
+            records = game_records(round_name, candidate.name, idx, seed,
+                                   seats, games)
+            if log is not None:
+                log.append(records)
+        wins = sum(record["winner"] == candidate.name for record in records)
+        test.add_pair(wins)
+        print("  Match {}: {}".format(idx + 1, test))
+
+    status = test.status()
+    if status == "H1":
+        print("\nH1 accepted: {} is at least {:+.0f} Elo".format(
+            candidate.name, test.elo1))
+    elif status == "H0":
+        print("\nH0 accepted: {} is at most {:+.0f} Elo".format(
+            candidate.name, test.elo0))
+    else:
+        print("\nNo decision after {} matches".format(max_matches))
+    return status
+
+
+def play_rated(agents, ratings, num_matches, pool=None, log=None,
+               batch_size=1):
+    """
+    Play `num_matches` matches among any number of agents, each time
+    pairing the agents whose ratings (a ratings.Ratings) are the least
+    certain relative to each other, and add the games to the ratings.
+
+    With a process `pool` or a job_queue.Coordinator, the `batch_size` most
+    informative pairings are played at once before the ratings are updated.
+    With a game_log.GameLog, matches are logged and resumed as in
+    play_round().
+    """
+    if len(agents) < 2:
+        raise ValueError("Rating matches need at least two agents.")
+    round_name = "Ratings"
+    by_name = {agent.name: agent for agent in agents}
+    for agent in agents:
+        ratings.add_agent(agent.name)
+    # draw the seeds of the matches from a generator of their own, so that
+    # the agents cannot change them
+    seeds = random.Random(random.getrandbits(32))
+    match = 0
+
+    print("\nPlaying Matches:")
+    print("----------")
+
+    while match < num_matches:
+        scheduled = []
+        for names in ratings.pairings(min(batch_size, num_matches - match),
+                                      by_name):
+            seats = (by_name[names[0]], by_name[names[1]])
+            seed = seeds.getrandbits(32)
+            logged, pending = None, None
+            if log is not None:
+                logged = log.completed(round_name, match)
+                if logged and set(logged[0]["players"]) != set(names):
+                    logged = None
+            if logged is None and pool is not None:
+                pending = pool.apply_async(
+                    play_match, (seats[0].player, seats[1].player, seed))
+            scheduled.append((match, seed, seats, logged, pending))
+            match += 1
+
+        for idx, seed, seats, records, pending in scheduled:
+            if records is None:
+                if pending is not None:
+                    _, _, games = pending.get()
+                else:
+                    _, _, games = play_match(seats[0].player,
+                                             seats[1].player, seed)
+                records = game_records(round_name, seats[0].name, idx, seed,
+                                       seats, games)
+                if log is not None:
+                    log.append(records)
+            ratings.add_records(records)
+            wins = sum(record["winner"] == seats[0].name
+                       for record in records)
+            print("  Match {}: {!s:^11} vs {!s:^11}\tResult: {} to {}".format(
+                idx + 1, seats[0].name, seats[1].name, wins,
+                len(records) - wins))
+
+    print("\n\nRatings:")
+    print("----------")
+    for name, rating, low, high, games in ratings.table():
+        print("{!s:<15}{:>8.1f} [{:>7.1f}, {:>7.1f}]{:>6} games".format(
+            name, rating, low, high, games))
+    return ratings
+
+
+def print_summary(path):
+    """Print the result tables of all rounds in a game log."""
+    for round_name, name, rows, win_ratio in summarize(read_records(path)):
+        print("")
+        print("*************************")
+        print("{:^25}".format("Evaluating: " + round_name))
+        print("*************************")
+        print("")
+        for idx, (opponent, won, lost) in enumerate(rows):
+            print("  Match {}: {!s:^11} vs {!s:^11}".format(
+                idx + 1, name, opponent), end=' ')
+            print("\tResult: {} to {}".format(won, lost))
+        print("\n\nResults:")
+        print("----------")
+        print("{!s:<15}{:>10.2f}%".format(name, win_ratio))
+
+
+def play_rounds(test_agents, opponents, pool=None, log=None):
+    """Evaluate each test agent in a round against the opponents."""
+    print(DESCRIPTION)
+    for agentUT in test_agents:
+        print("")
+        print("*************************")
+        print("{:^25}".format("Evaluating: " + agentUT.name))
+        print("*************************")
+
+        agents = opponents + [agentUT]
+        win_ratio = play_round(agents, NUM_MATCHES, pool, log)
+
+        print("\n\nResults:")
+        print("----------")
+        print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
 
 
 def main():
 
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--serve", metavar="HOST:PORT",
+                        help="hand out the matches to remote workers")
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="play matches for the coordinator at HOST:PORT")
+    parser.add_argument("--authkey",
+                        help="the shared secret of coordinator and workers; "
+                             "required unless HOST is a loopback address")
+    parser.add_argument("--log", metavar="PATH",
+                        help="append every game to a JSONL log, skipping "
+                             "the matches it already holds")
+    parser.add_argument("--seed", type=int,
+                        help="seed the schedule, so that a resumed run "
+                             "plays the same matches")
+    parser.add_argument("--sprt", action="store_true",
+                        help="play Student against ID_Improved until an "
+                             "SPRT decides between --elo0 and --elo1")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="the Elo difference of H0 (default: 0)")
+    parser.add_argument("--elo1", type=float, default=20.,
+                        help="the Elo difference of H1 (default: 20)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="the false positive rate (default: 0.05)")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="the false negative rate (default: 0.05)")
+    parser.add_argument("--max-matches", type=int, default=SPRT_MAX_MATCHES,
+                        help="stop the SPRT after this many matches")
+    parser.add_argument("--rate", type=int, metavar="N",
+                        help="play N matches among all agents, pairing "
+                             "those with the least certain ratings")
+    parser.add_argument("--batch", type=int, default=NUM_WORKERS,
+                        help="the number of SPRT or rating matches played "
+                             "at once by the workers")
+    parser.add_argument("--summary", action="store_true",
+                        help="print the results in --log without playing")
+    args = parser.parse_args()
+    authkey = args.authkey.encode() if args.authkey else None
+    for address in (args.serve, args.connect):
+        if address:
+            try:
+                check_authkey(parse_address(address), authkey)
+            except ValueError as error:
+                parser.error(str(error))
+
+    if args.summary:
+        if not args.log:
+            parser.error("--summary requires --log")
+        print_summary(args.log)
+        return
+
+    if args.connect:
+        count = run_worker(parse_address(args.connect), authkey)
+        print("Played {} matches".format(count))
+        return
+
     HEURISTICS = [("Null", null_score),
                   ("Open", open_move_score),
                   ("Improved", improved_score)]
     AB_ARGS = {"search_depth": 5, "method": 'alphabeta', "iterative": False}
     MM_ARGS = {"search_depth": 3, "method": 'minimax', "iterative": False}
-    CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True}
+    CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True, 'inplace': True,
+                   'tt_size': 2 ** 16, 'ordering': True, 'check_interval': 64,
+                   'eval_cache_size': 2 ** 16}
 
     # Create a collection of CPU agents using fixed-depth minimax or alpha beta
     # search, or random selection.  The agent names encode the search method
@@ -163,19 +514,44 @@ def main():
     test_agents = [Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved"),
                    Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
 
-    print(DESCRIPTION)
-    for agentUT in test_agents:
-        print("")
-        print("*************************")
-        print("{:^25}".format("Evaluating: " + agentUT.name))
-        print("*************************")
-
-        agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
-
-        print("\n\nResults:")
-        print("----------")
-        print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
+    pool = None
+    if args.serve:
+        pool = Coordinator(parse_address(args.serve), authkey)
+    elif NUM_WORKERS > 1:
+        pool = make_pool(NUM_WORKERS, PIN_CPUS)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    log = GameLog(args.log) if args.log else None
+
+    if args.sprt:
+        test = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+        play_sprt(test_agents[1], test_agents[0], test, args.max_matches,
+                  pool, log, args.batch)
+    elif args.rate:
+        ratings = Ratings()
+        if log is not None:
+            # rate the games of earlier rounds too; logged rating matches
+            # are added again as they are resumed
+            ratings.add_records(record for record in log.games.values()
+                                if record["round"] != "Ratings")
+        play_rated(random_agents + mm_agents + ab_agents + test_agents,
+                   ratings, args.rate, pool, log, args.batch)
+    else:
+        play_rounds(test_agents, random_agents + mm_agents + ab_agents,
+                    pool, log)
+
+    if log is not None:
+        log.close()
+    if isinstance(pool, Coordinator):
+        pool.close()
+    elif pool is not None:
+        if args.sprt:
+            # drop the matches played ahead of the decision
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
 
 
 if __name__ == "__main__":
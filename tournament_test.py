@@ -0,0 +1,383 @@
+"""
+This file contains test cases for the tournament runner in tournament.py.
+"""
+import io
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+
+from contextlib import redirect_stdout
+
+import game_agent
+import game_log
+import job_queue
+import ratings
+import sprt
+import tournament
+
+from sample_players import RandomPlayer
+from sample_players import improved_score
+from tournament import Agent
+
+
+def make_agents():
+    """Return a small field of agents whose games only depend on the seed of
+    each match"""
+    # agent_test.py reloads game_agent, so look the class up when called
+    return [Agent(RandomPlayer(), "Random"),
+            Agent(game_agent.CustomPlayer(1, improved_score, False,
+                                          "alphabeta"), "AB_1"),
+            Agent(game_agent.CustomPlayer(2, improved_score, False,
+                                          "minimax"), "MM_2")]
+
+
+# forked workers would inherit the listening socket of the coordinator
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def grab_job(address):
+    """Take a job from the coordinator and exit without returning it"""
+    return job_queue._request(address, job_queue.AUTHKEY, ("get",))
+
+
+def late_worker(address, delay):
+    time.sleep(delay)
+    job_queue.run_worker(address)
+
+
+class ParallelRoundTest(unittest.TestCase):
+
+    def play(self, pool=None):
+        random.seed(21)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            # the matches of the first round must not change the seeds of
+            # the second
+            win_ratios = [tournament.play_round(make_agents(), 2, pool)
+                          for _ in range(2)]
+        return win_ratios, output.getvalue()
+
+    def test_pool_matches_serial_round(self):
+        """Rounds played on a process pool give the same tables"""
+        expected = self.play()
+        pool = tournament.make_pool(2)
+        try:
+            self.assertEqual(expected, self.play(pool))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def test_coordinator_matches_serial_round(self):
+        """Rounds played by remote workers give the same tables"""
+        expected = self.play()
+        coordinator = job_queue.Coordinator()
+        workers = [SPAWN.Process(target=job_queue.run_worker,
+                                 args=(coordinator.address,))
+                   for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        try:
+            self.assertEqual(expected, self.play(coordinator))
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(10)
+                if worker.is_alive():
+                    worker.terminate()
+
+
+class CoordinatorTest(unittest.TestCase):
+
+    def test_expired_lease(self):
+        """A job taken by a crashed worker is handed to another worker"""
+        coordinator = job_queue.Coordinator(lease=0.2)
+        result = coordinator.apply_async(pow, (2, 10))
+        crashed = SPAWN.Process(target=grab_job,
+                                args=(coordinator.address,))
+        worker = SPAWN.Process(target=late_worker,
+                               args=(coordinator.address, 0.5))
+        crashed.start()
+        worker.start()
+        try:
+            coordinator.serve_one()
+            self.assertFalse(result.ready())
+            self.assertEqual(1024, result.get())
+        finally:
+            coordinator.close()
+            crashed.join()
+            worker.join(10)
+            if worker.is_alive():
+                worker.terminate()
+
+    def test_authkey(self):
+        """Addresses reachable from other machines need a secret authkey"""
+        self.assertEqual(job_queue.AUTHKEY,
+                         job_queue.check_authkey(("127.0.0.1", 0), None))
+        for address in (("0.0.0.0", 6000), ("coordinator-host", 6000)):
+            for authkey in (None, job_queue.AUTHKEY):
+                with self.assertRaises(ValueError):
+                    job_queue.check_authkey(address, authkey)
+            self.assertEqual(b"secret",
+                             job_queue.check_authkey(address, b"secret"))
+        with self.assertRaises(ValueError):
+            job_queue.Coordinator(("0.0.0.0", 0))
+
+
+class GameLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "games.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def play(self, num_matches=1):
+        random.seed(23)
+        log = game_log.GameLog(self.path)
+        try:
+            with redirect_stdout(io.StringIO()):
+                return tournament.play_round(make_agents(), num_matches,
+                                             log=log)
+        finally:
+            log.close()
+
+    def test_records(self):
+        """Every game of the round is logged with its moves and times"""
+        self.play()
+        records = game_log.read_records(self.path)
+        self.assertEqual(8, len(records))
+        for record in records:
+            self.assertEqual("MM_2", record["round"])
+            self.assertIn(record["winner"], record["players"])
+            self.assertEqual(2, len(record["opening"]))
+            num_moves = len(record["moves"])
+            self.assertIn(len(record["times"]), (num_moves, num_moves + 1))
+
+    def test_resume(self):
+        """Matches in the log are not played again"""
+        win_ratio = self.play()
+        with open(self.path) as f:
+            lines = f.readlines()
+        # drop the last match and cut the line before it short
+        with open(self.path, "w") as f:
+            f.writelines(lines[:-3])
+            f.write(lines[-3][:10])
+        self.assertEqual(win_ratio, self.play())
+        with open(self.path) as f:
+            self.assertEqual(lines[:-3], f.readlines()[:-4])
+        records = game_log.read_records(self.path)
+        self.assertEqual(9, len(records))
+        self.assertEqual(8, len(game_log.latest_games(records)))
+
+    def play_two_rounds(self):
+        random.seed(23)
+        log = game_log.GameLog(self.path)
+        agents = make_agents()
+        try:
+            with redirect_stdout(io.StringIO()):
+                # MM_2, then AB_1 is the agent under test
+                return [tournament.play_round(field, 1, log=log)
+                        for field in (agents, agents[:1] + agents[:0:-1])]
+        finally:
+            log.close()
+
+    def test_resume_two_rounds(self):
+        """A run resumed after its first round plays the same second round"""
+        win_ratios = self.play_two_rounds()
+        records = game_log.read_records(self.path)
+        self.assertEqual(["AB_1"] * 8, [r["round"] for r in records[8:]])
+        with open(self.path) as f:
+            lines = f.readlines()
+        # keep the first round and the first match of the second
+        with open(self.path, "w") as f:
+            f.writelines(lines[:10])
+        self.assertEqual(win_ratios, self.play_two_rounds())
+        resumed = game_log.read_records(self.path)
+        for key in ("seed", "opening", "moves", "winner"):
+            self.assertEqual([r[key] for r in records],
+                             [r[key] for r in resumed])
+
+    def test_summary(self):
+        """The results of a round are derived again from its log"""
+        win_ratio = self.play(2)
+        (round_name, name, rows, logged_ratio), = game_log.summarize(
+            game_log.read_records(self.path))
+        self.assertEqual(("MM_2", "MM_2"), (round_name, name))
+        self.assertEqual(["Random", "AB_1"], [row[0] for row in rows])
+        self.assertEqual([8, 8], [row[1] + row[2] for row in rows])
+        self.assertAlmostEqual(win_ratio, logged_ratio)
+
+    def test_summary_skips_rating_matches(self):
+        """Rounds with several agents under test are not summarized"""
+        records = [{"round": "Ratings", "agent": first, "match": match,
+                    "game": game, "players": [first, second],
+                    "winner": first}
+                   for match, (first, second) in enumerate(
+                       [("A", "B"), ("C", "B"), ("B", "C")])
+                   for game in range(2)]
+        self.assertEqual([], game_log.summarize(records))
+
+
+class SPRTTest(unittest.TestCase):
+
+    def test_elo_score(self):
+        """Elo differences and expected scores convert both ways"""
+        self.assertAlmostEqual(0.5, sprt.elo_to_score(0.))
+        self.assertAlmostEqual(10 / 11., sprt.elo_to_score(400.))
+        for elo in (-150., 0., 35.):
+            self.assertAlmostEqual(
+                elo, sprt.score_to_elo(sprt.elo_to_score(elo)))
+
+    def test_llr(self):
+        """The log-likelihood ratio follows the mean and variance of the
+        pair scores"""
+        test = sprt.SPRT(0., 400., alpha=0.05, beta=0.1)
+        self.assertEqual(0., test.llr)
+        for wins in (2, 2, 1, 0):
+            test.add_pair(wins)
+        self.assertEqual((5, 3, 8), (test.wins, test.losses, test.games))
+        counts = [1.5, 1.5, 2.5]
+        mean = (1.5 * 0.5 + 2.5) / 5.5
+        variance = (1.5 * mean ** 2 + 1.5 * (0.5 - mean) ** 2 +
+                    2.5 * (1. - mean) ** 2) / sum(counts)
+        llr = 4 * (10 / 11. - 0.5) * (2 * mean - 10 / 11. - 0.5) / (2 * variance)
+        self.assertAlmostEqual(llr, test.llr)
+        self.assertAlmostEqual(math.log(0.1 / 0.95), test.lower)
+        self.assertAlmostEqual(math.log(0.9 / 0.05), test.upper)
+        self.assertIsNone(test.status())
+
+    def test_decisions(self):
+        """Clear results stop the test early; even ones stop it late"""
+        strong, weak = sprt.SPRT(), sprt.SPRT()
+        while strong.status() is None:
+            strong.add_pair(2)
+        while weak.status() is None:
+            weak.add_pair(1)
+        self.assertEqual("H1", strong.status())
+        self.assertEqual("H0", weak.status())
+        self.assertLess(strong.games, weak.games)
+        with self.assertRaises(ValueError):
+            sprt.SPRT(10., 0.)
+
+    def test_correlated_pairs(self):
+        """Pairs whose two games agree carry less evidence than split pairs
+        with the same number of wins"""
+        split, agreeing = sprt.SPRT(), sprt.SPRT()
+        for wins in (2, 0) * 10:
+            split.add_pair(1)
+            agreeing.add_pair(wins)
+        self.assertEqual((split.wins, split.losses),
+                         (agreeing.wins, agreeing.losses))
+        self.assertLess(split.llr, agreeing.llr)
+        self.assertLess(agreeing.llr, 0.)
+
+    def play(self, pool=None, batch_size=1):
+        random.seed(24)
+        candidate, baseline = make_agents()[2], make_agents()[0]
+        test = sprt.SPRT(0., 200.)
+        with redirect_stdout(io.StringIO()):
+            status = tournament.play_sprt(candidate, baseline, test, 50,
+                                          pool, batch_size=batch_size)
+        return status, test.wins, test.losses
+
+    def test_play_sprt(self):
+        """A much stronger candidate is accepted, with or without a pool"""
+        expected = self.play()
+        self.assertEqual("H1", expected[0])
+        self.assertLess(sum(expected[1:]), 100)
+        pool = tournament.make_pool(2)
+        try:
+            self.assertEqual(expected, self.play(pool, 4))
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class RatingsTest(unittest.TestCase):
+
+    def test_two_agents(self):
+        """Ratings follow the score between two agents"""
+        rated = ratings.Ratings()
+        for _ in range(10):
+            rated.add_game("A", "B")
+            rated.add_game("A", "B")
+            rated.add_game("A", "B")
+            rated.add_game("B", "A")
+        self.assertAlmostEqual(0., rated.rating("A") + rated.rating("B"))
+        # the prior pulls the ratings slightly towards each other
+        self.assertLess(rated.expected_score("A", "B"), 0.75)
+        self.assertGreater(rated.expected_score("A", "B"), 0.7)
+        low, high = rated.interval("A")
+        self.assertLess(low, rated.rating("A"))
+        self.assertGreater(high, rated.rating("A"))
+        self.assertEqual(40, rated.games("B"))
+
+    def test_undefeated(self):
+        """An agent that won every game has a finite rating"""
+        rated = ratings.Ratings()
+        for _ in range(20):
+            rated.add_game("A", "B")
+        self.assertGreater(rated.rating("A"), 100.)
+        self.assertTrue(math.isfinite(rated.rating("A")))
+
+    def test_incremental(self):
+        """Ratings read between games match a fit of all games at once"""
+        games = [("A", "B"), ("B", "C"), ("A", "C"), ("C", "A"), ("A", "B"),
+                 ("B", "C"), ("C", "B"), ("A", "C")]
+        streamed = ratings.Ratings()
+        for winner, loser in games:
+            streamed.add_game(winner, loser)
+            streamed.table()
+        batch = ratings.Ratings()
+        for winner, loser in games:
+            batch.add_game(winner, loser)
+        for name in "ABC":
+            self.assertAlmostEqual(batch.rating(name), streamed.rating(name))
+            self.assertAlmostEqual(batch.interval(name)[0],
+                                   streamed.interval(name)[0])
+        self.assertEqual("A", batch.table()[0][0])
+
+    def test_pairings(self):
+        """Agents with few games are paired first"""
+        rated = ratings.Ratings()
+        for _ in range(20):
+            rated.add_game("A", "B")
+            rated.add_game("B", "A")
+        rated.add_agent("C")
+        self.assertEqual(("A", "B"), rated.pairings(3)[-1])
+        self.assertIn("C", rated.pairings()[0])
+        self.assertEqual([("A", "B")], rated.pairings(3, ["B", "A"]))
+
+    def play(self, pool=None, batch_size=1):
+        random.seed(25)
+        rated = ratings.Ratings()
+        with redirect_stdout(io.StringIO()):
+            tournament.play_rated(make_agents(), rated, 4, pool,
+                                  batch_size=batch_size)
+        return rated
+
+    def test_play_rated(self):
+        """Rating matches cover the least known pairings first"""
+        rated = self.play()
+        # every pair plays once before any pair plays again
+        self.assertEqual([4, 6, 6], sorted(rated.games(name)
+                                           for name in rated.names))
+        self.assertEqual("Random", rated.table()[-1][0])
+        with self.assertRaises(ValueError):
+            tournament.play_rated(make_agents()[:1], rated, 4)
+        pool = tournament.make_pool(2)
+        try:
+            self.assertEqual(rated.table(), self.play(pool).table())
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
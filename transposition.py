@@ -0,0 +1,371 @@
+"""This file contains fixed-size caches keyed by position hash: a
+transposition table for the results of alpha-beta search, so that positions
+reached through different move orders (or searched again by the next
+iterative deepening iteration) do not need to be searched from scratch, a
+variant of the table that several processes can share, and a cache of
+heuristic evaluation scores.
+"""
+import os
+import struct
+
+from collections import namedtuple
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+# Bound types describing how a stored score relates to the true minimax value
+EXACT = 0  # the score is the exact value of the position
+LOWER = 1  # the search failed high; the true value is at least the score
+UPPER = 2  # the search failed low; the true value is at most the score
+
+# Mixed into the position hash when a position is scored from the point of
+# view of the player who is not to move; together with the side to move
+# (already part of Board.zobrist) this identifies the scoring player
+PERSPECTIVE_KEY = 0x9e3779b97f4a7c15
+
+Entry = namedtuple("Entry", ["key", "depth", "score", "bound", "move",
+                             "generation"])
+
+
+class TranspositionTable(object):
+    """A hash table of search results with a fixed number of slots.
+
+    Each position hash maps to exactly one slot, so memory use is fixed by
+    the table size no matter how long the table is used. When two positions
+    map to the same slot, the replacement policy decides which one is kept.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The maximum number of entries held in the table.
+
+    policy : {'depth', 'always'} (optional)
+        The replacement policy used when a slot is already occupied by a
+        different position. 'depth' keeps the deeper of the two searches
+        (entries left over from earlier calls to get_move() are always
+        replaced), and 'always' replaces the stored entry unconditionally.
+    """
+    POLICIES = ('depth', 'always')
+
+    def __init__(self, size=2 ** 16, policy='depth'):
+        if size < 1:
+            raise ValueError("Transposition table size must be positive.")
+        if policy not in TranspositionTable.POLICIES:
+            raise ValueError("Unknown replacement policy: {}".format(policy))
+        self.size = size
+        self.policy = policy
+        self.generation = 0
+        self._table = [None] * size
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the hit/miss/collision counters."""
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        """Return the table counters as a dict.
+
+        Every probe counts as exactly one of a hit (the position was found),
+        a miss (the slot was empty) or a collision (the slot holds a
+        different position).
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "collisions": self.collisions}
+
+    def new_search(self):
+        """Mark all stored entries as belonging to an earlier search."""
+        self.generation += 1
+
+    def clear(self):
+        """Remove all entries from the table."""
+        self._table = [None] * self.size
+
+    def probe(self, key):
+        """Return the stored entry for a position hash, or None.
+
+        Parameters
+        ----------
+        key : int
+            The position hash (e.g., `Board.zobrist`).
+
+        Returns
+        ----------
+        Entry or None
+            The (key, depth, score, bound, move, generation) tuple stored for
+            the position, or None if the position is not in the table.
+        """
+        entry = self._table[key % self.size]
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.key != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a position, subject to the
+        replacement policy.
+
+        Parameters
+        ----------
+        key : int
+            The position hash (e.g., `Board.zobrist`).
+
+        depth : int
+            The remaining search depth the score was computed with.
+
+        score : float
+            The score returned by the search.
+
+        bound : {EXACT, LOWER, UPPER}
+            How the score relates to the true value of the position.
+
+        move : (int, int)
+            The best move found for the position.
+        """
+        slot = key % self.size
+        entry = self._table[slot]
+        if (self.policy == 'depth' and entry is not None and
+                entry.key != key and entry.depth > depth and
+                entry.generation == self.generation):
+            return
+        self._table[slot] = Entry(key, depth, score, bound, move,
+                                  self.generation)
+
+
+# Shared table layout: the current generation, followed by one slot per
+# entry holding (key ^ meta ^ score bits, meta, score bits), where meta
+# packs a valid flag, the depth, the bound, the generation and the move
+GENERATION = struct.Struct("<Q")
+SLOT = struct.Struct("<QQQ")
+SCORE = struct.Struct("<d")
+SCORE_BITS = struct.Struct("<Q")
+NO_MOVE = 0xffff
+
+# The names of the shared tables created by this process (or by the process
+# it was forked from)
+_created_tables = set()
+
+
+def _has_own_tracker():
+    """Test whether this process uses a resource tracker of its own rather
+    than the one of the process that started it with multiprocessing.
+    """
+    tracker = resource_tracker._resource_tracker
+    if tracker._fd is None:
+        # attaching will start a tracker for this process
+        return True
+    if tracker._pid is None:
+        # a spawned child that was handed the tracker of its parent
+        return False
+    try:
+        # only the process that started a tracker can wait for it
+        os.waitpid(tracker._pid, os.WNOHANG)
+    except ChildProcessError:
+        return False
+    return True
+
+
+class SharedTranspositionTable(object):
+    """A transposition table stored in `multiprocessing.shared_memory`, so
+    that search processes on one host can share their results.
+
+    The table has the same interface and replacement policies as
+    `TranspositionTable`. Slots are written without locks; every slot
+    stores its key XORed with the rest of the slot, so a slot that is read
+    while another process is writing it (or that holds a different
+    position) fails the key check and is counted as a collision.
+
+    Scores are stored as 64-bit floats, depths up to 255 and board moves
+    with up to 256 rows and columns.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The maximum number of entries held in the table.
+
+    policy : {'depth', 'always'} (optional)
+        The replacement policy (see `TranspositionTable`).
+
+    name : str (optional)
+        The name of an existing shared table to attach to; a new table is
+        created if None. The process that creates the table should call
+        `unlink()` when it is no longer needed.
+    """
+
+    def __init__(self, size=2 ** 16, policy='depth', name=None):
+        if size < 1:
+            raise ValueError("Transposition table size must be positive.")
+        if policy not in TranspositionTable.POLICIES:
+            raise ValueError("Unknown replacement policy: {}".format(policy))
+        self.size = size
+        self.policy = policy
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=GENERATION.size + size * SLOT.size)
+            _created_tables.add(self._shm.name)
+        else:
+            untrack = name not in _created_tables and _has_own_tracker()
+            self._shm = shared_memory.SharedMemory(name=name)
+            if untrack:
+                # attaching registered the table with this process's own
+                # tracker, which would remove it when this process exits;
+                # a tracker shared with the creator must keep it registered
+                # so that it is freed if the creator crashes
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.name = self._shm.name
+        self.reset_stats()
+
+    def __getstate__(self):
+        # attach to the same block of shared memory, e.g., in worker processes
+        return self.size, self.policy, self.name
+
+    def __setstate__(self, state):
+        size, policy, name = state
+        self.__init__(size, policy, name)
+
+    @property
+    def generation(self):
+        """The number of searches started with new_search() by any of the
+        processes sharing the table.
+        """
+        return GENERATION.unpack_from(self._shm.buf, 0)[0]
+
+    def reset_stats(self):
+        """Zero the hit/miss/collision counters of this process."""
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        """Return the table counters of this process as a dict."""
+        return {"hits": self.hits, "misses": self.misses,
+                "collisions": self.collisions}
+
+    def new_search(self):
+        """Mark all stored entries as belonging to an earlier search."""
+        GENERATION.pack_into(self._shm.buf, 0, self.generation + 1)
+
+    def clear(self):
+        """Remove all entries from the table."""
+        end = GENERATION.size + self.size * SLOT.size
+        self._shm.buf[GENERATION.size:end] = bytes(end - GENERATION.size)
+
+    def close(self):
+        """Detach this process from the table."""
+        self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory of the table once every process has
+        detached from it.
+        """
+        self._shm.unlink()
+        _created_tables.discard(self.name)
+
+    def probe(self, key):
+        """Return the stored entry for a position hash, or None.
+
+        See `TranspositionTable.probe` for details.
+        """
+        check, meta, bits = SLOT.unpack_from(self._shm.buf, self._offset(key))
+        if not meta & 1:
+            self.misses += 1
+            return None
+        if check ^ meta ^ bits != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        move = meta >> 32 & 0xffff
+        if move == NO_MOVE:
+            move = None
+        else:
+            move = (move >> 8, move & 0xff)
+        score = SCORE.unpack(SCORE_BITS.pack(bits))[0]
+        return Entry(key, meta >> 1 & 0xff, score, meta >> 9 & 0x3, move,
+                     meta >> 16 & 0xffff)
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a position, subject to the
+        replacement policy.
+
+        See `TranspositionTable.store` for details.
+        """
+        offset = self._offset(key)
+        generation = self.generation & 0xffff
+        if self.policy == 'depth':
+            check, meta, bits = SLOT.unpack_from(self._shm.buf, offset)
+            if (meta & 1 and check ^ meta ^ bits != key and
+                    meta >> 1 & 0xff > depth and
+                    meta >> 16 & 0xffff == generation):
+                return
+        packed_move = NO_MOVE if move is None else move[0] << 8 | move[1]
+        meta = (1 | min(depth, 0xff) << 1 | bound << 9 | generation << 16 |
+                packed_move << 32)
+        bits = SCORE_BITS.unpack(SCORE.pack(score))[0]
+        SLOT.pack_into(self._shm.buf, offset, key ^ meta ^ bits, meta, bits)
+
+    def _offset(self, key):
+        return GENERATION.size + key % self.size * SLOT.size
+
+
+class EvalCache(object):
+    """Wrap a heuristic evaluation function with a least-recently-used cache
+    of its scores, keyed by position hash and scoring player.
+
+    An EvalCache can be used anywhere the wrapped function can, e.g., as the
+    `score_fn` of a `game_agent.CustomPlayer`.
+
+    Parameters
+    ----------
+    score_fn : callable
+        A heuristic function with the signature score_fn(game, player).
+
+    size : int (optional)
+        The maximum number of scores held in the cache; the least recently
+        used score is evicted when the cache is full.
+    """
+
+    def __init__(self, score_fn, size=2 ** 16):
+        if size < 1:
+            raise ValueError("Evaluation cache size must be positive.")
+        self.score_fn = score_fn
+        self.size = size
+        self._cache = OrderedDict()
+        self.reset_stats()
+
+    def __call__(self, game, player):
+        key = game.zobrist
+        if player != game.active_player:
+            key ^= PERSPECTIVE_KEY
+        cache = self._cache
+        score = cache.get(key)
+        if score is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            return score
+        self.misses += 1
+        score = self.score_fn(game, player)
+        cache[key] = score
+        if len(cache) > self.size:
+            cache.popitem(last=False)
+        return score
+
+    def reset_stats(self):
+        """Zero the hit/miss counters (e.g., at the start of a new game)."""
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the cache counters and hit rate as a dict."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.,
+                "entries": len(self._cache)}
+
+    def clear(self):
+        """Remove all scores from the cache."""
+        self._cache.clear()